@@ -0,0 +1,234 @@
+"""Benchmarks for the scheduling, parsing and render hot paths.
+
+Runs fully offline on synthetic ICS feeds (folded lines, all-day and UTC events) and prints
+one JSON object per measurement: timing (min/median per call) plus tracemalloc peak and
+net allocation for a single call.
+
+    python bench.py                                 # default sizes 10 … 100k events
+    python bench.py --sizes 100 1000 --out bench_output.txt
+    python bench.py --compare baseline.jsonl        # flag benchmarks ≥25% slower than a saved run
+    python bench.py --write-fixtures fixtures/      # dump the generated feeds as .ics files
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from calmsync import bandit, engine
+from calmsync.assets import page_style
+from calmsync.busyindex import BusyIndex, EventTable
+from calmsync.ics import TZ, _parse_ics_dt, iter_ics_events, parse_ics
+from calmsync.ranking import rank
+from calmsync.signals import SignalStream, mock_device
+from calmsync.visuals import gradient_tag, sma_gradient_svg, svg_tag
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000)
+ANCHOR = datetime(2026, 3, 2, 9, 0, tzinfo=TZ)   # fixed so runs are comparable
+
+
+def synthetic_ics(n_events: int, seed: int = 0, history_days: int = 730, ahead_days: int = 60,
+                  anchor: datetime = ANCHOR) -> str:
+    """A feed of `n_events` spread over `history_days` back and `ahead_days` forward of `anchor`."""
+    rng = random.Random(seed)
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//CalmSync//bench//EN"]
+    span = (history_days + ahead_days) * 24 * 60
+    for i in range(n_events):
+        start = anchor - timedelta(days=history_days) + timedelta(minutes=rng.randrange(0, span, 15))
+        lines += ["BEGIN:VEVENT", f"UID:bench-{seed}-{i}@calmsync",
+                  f"DTSTAMP:{start.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"]
+        kind = rng.random()
+        if kind < 0.05:
+            lines += [f"DTSTART;VALUE=DATE:{start:%Y%m%d}", f"DTEND;VALUE=DATE:{start + timedelta(days=1):%Y%m%d}"]
+        elif kind < 0.55:
+            end = start + timedelta(minutes=rng.choice((15, 30, 45, 60, 90)))
+            lines += [f"DTSTART:{start.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}",
+                      f"DTEND:{end.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"]
+        else:
+            end = start + timedelta(minutes=rng.choice((15, 30, 45, 60, 90)))
+            lines += [f"DTSTART:{start:%Y%m%dT%H%M%S}", f"DTEND:{end:%Y%m%dT%H%M%S}"]
+        if rng.random() < 0.1: lines.append("TRANSP:TRANSPARENT")
+        lines += [f"SUMMARY:Synthetic meeting {i} about the quarterly planning of proje",
+                  " ct number " + str(rng.randrange(1000)),           # folded continuation
+                  "DESCRIPTION:" + "lorem ipsum " * 8,
+                  "END:VEVENT"]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+def synthetic_busy(n_events: int, seed: int = 0, days: int = 30):
+    """`n_events` busy tuples inside the 30-day scheduling window, sorted by start."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n_events):
+        s = ANCHOR + timedelta(minutes=rng.randrange(0, days * 24 * 60, 5))
+        out.append((s, s + timedelta(minutes=rng.choice((15, 30, 45, 60))), "busy"))
+    out.sort(key=lambda x: x[0])
+    return out
+
+def linear_overlaps(events, start, end):
+    """The pre-index scan, kept as the scaling baseline."""
+    for s, e, _ in events:
+        if start < e and end > s: return True
+    return False
+
+
+def measure(name, fn, n=None, min_time=0.2, max_repeat=1000, **extra):
+    fn()  # warm-up
+    times = []; deadline = time.perf_counter() + min_time
+    while len(times) < max_repeat and (len(times) < 3 or time.perf_counter() < deadline):
+        t0 = time.perf_counter(); fn(); times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"bench": name, "n": n, "repeat": len(times),
+            "min_us": round(min(times) * 1e6, 2), "median_us": round(statistics.median(times) * 1e6, 2),
+            "peak_kib": round((peak - before) / 1024, 1), "retained_kib": round((current - before) / 1024, 1), **extra}
+
+
+def bench_parsing(sizes):
+    for n in sizes:
+        text = synthetic_ics(n)
+        lines = text.splitlines()
+        window = (ANCHOR, ANCHOR + timedelta(days=30))
+        yield measure("parse_ics", lambda: parse_ics(text), n, bytes=len(text))
+        yield measure("iter_ics_events.window", lambda: sum(1 for _ in iter_ics_events(lines, *window)), n, bytes=len(text))
+    for v, tzid in (("20260302T090000Z", None), ("20260302T090000", None), ("20260302", None),
+                    ("20260302T090000", "America/New_York")):
+        yield measure("_parse_ics_dt", lambda v=v, tzid=tzid: _parse_ics_dt(v, tzid), None, value=v, tzid=tzid)
+        yield measure("_parse_ics_dt.uncached", lambda v=v, tzid=tzid: _parse_ics_dt.__wrapped__(v, tzid), None,
+                      value=v, tzid=tzid)
+
+def bench_slots(sizes):
+    day_lo = ANCHOR.replace(hour=8, minute=0); day_hi = ANCHOR.replace(hour=22, minute=0)
+    step = timedelta(minutes=30); dur = timedelta(minutes=30)
+    durations = [timedelta(minutes=d) for d in range(15, 61, 5)]
+    for n in sizes:
+        busy = synthetic_busy(n)
+        index = BusyIndex(busy)
+        probe = ANCHOR + timedelta(days=15, hours=3)
+        table = EventTable(busy)
+        zero = timedelta(0)   # forces fresh datetime objects, like a per-session parse used to
+        yield measure("busy.tuple_list", lambda: [(s + zero, e + zero, t) for s, e, t in busy], n)
+        yield measure("eventtable.build", lambda: EventTable(busy), n)
+        feeds = [EventTable(busy[i::3]) for i in range(3)]   # work / personal / team
+        yield measure("eventtable.merge3", lambda: EventTable.merge(feeds), n)
+        yield measure("eventtable.on_day", lambda: list(table.on_day(day_lo.replace(hour=0), day_lo.replace(hour=0) + timedelta(days=1))), n)
+        yield measure("busyindex.build", lambda: BusyIndex.from_arrays(table.starts, table.ends), n)
+        yield measure("busyindex.overlaps", lambda: index.overlaps(probe, probe + dur), n)
+        yield measure("linear.overlaps", lambda: linear_overlaps(busy, probe, probe + dur), n)
+        yield measure("busyindex.slots_day", lambda: list(index.slots(day_lo, day_hi, dur, step)), n)
+        wet = [0.0, 0.4, 2.0] * 64
+        yield measure("ranking.rank_7d", lambda: rank(index.starts, index.ends, day_lo, 1800, days=7, precip=wet,
+                                                      wind=wet, hour0=int(day_lo.timestamp()), sma=35, outdoor=True), n)
+        yield measure("busyindex.slot_table_day", lambda: index.slot_table(day_lo, day_hi, durations, step), n)
+        if n <= 10_000:
+            def linear_day():
+                out = []; cur = day_lo
+                while cur + dur <= day_hi:
+                    if not linear_overlaps(busy, cur, cur + dur): out.append(cur)
+                    cur += step
+                return out
+            yield measure("linear.slots_day", linear_day, n)
+
+def bench_bandit():
+    acts = ["Walk outside", "Stretch", "Breathe 4-7-8", "Tea break", "Power nap", "Quick tidy-up", "Listen to calm track"]
+    table = {a: {"n": 3, "value": random.Random(i).uniform(-2, 3)} for i, a in enumerate(acts)}
+    yield measure("bandit.choose", lambda: bandit.choose(table, acts, 0.05, 0.8), len(acts))
+    yield measure("bandit.update", lambda: bandit.update(dict(table), acts[0], bandit.reward(2.0, 7.0)), len(acts))
+    ctx = bandit.ContextTables(acts)
+    for i in range(bandit.MAX_CONTEXTS * 2):        # more contexts than the cap: exercises eviction
+        for a in acts: ctx.update(f"ctx{i}", a, random.Random(i).uniform(-2, 3))
+    yield measure("bandit.context_choose", lambda: ctx.choose(f"ctx{bandit.MAX_CONTEXTS * 2 - 1}", table, acts, 0.05, 0.8),
+                  len(acts), contexts=len(ctx))
+
+def bench_signals(sizes):
+    for n in sizes:
+        samples = list(itertools.islice(mock_device(start=ANCHOR.timestamp(), seed=0), n))
+        yield measure("signals.ingest_stream", lambda: SignalStream().extend(samples), n)
+    stream = SignalStream().extend(samples); ts = [samples[-1][0]]
+    def one():
+        ts[0] += 1; stream.ingest(ts[0], 72.0, 38.0)
+    yield measure("signals.ingest_one", one, None, window=len(stream.ring.buf))
+
+def bench_render():
+    for page in ("initial", "home", "after"):
+        yield measure("assets.page_style", lambda page=page: page_style(page), None, page=page)
+    yield measure("sma_gradient_svg", lambda: sma_gradient_svg(42))
+    svg = sma_gradient_svg(42)
+    yield measure("svg_tag", lambda: svg_tag(svg))
+    yield measure("gradient_tag", lambda: gradient_tag(42))
+    table = EventTable(synthetic_busy(1_000, days=7))
+    state = engine.init_state({"calendar_urls": ["bench"]}); engine.store_calendar_events(state, table)
+    day = ANCHOR.replace(hour=0)
+    yield measure("calendar_lines", lambda: engine.todays_calendar_lines(state, day), len(table))
+    def cold():
+        state["html_cache"].clear(); engine.home_overview(state, 42, day)
+    yield measure("home_overview.cold", cold, len(table))
+    yield measure("home_overview.cached", lambda: engine.home_overview(state, 42, day), len(table))
+
+
+def _meta():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        rev = None
+    return {"ts": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": rev,
+            "python": platform.python_version(), "machine": platform.machine()}
+
+def _key(rec):
+    return (rec["bench"], rec.get("n"), rec.get("page"), rec.get("value"), rec.get("tzid"))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    ap.add_argument("--only", nargs="+", choices=("parsing", "slots", "bandit", "signals", "render"))
+    ap.add_argument("--out", help="append JSON lines to this file as well as stdout")
+    ap.add_argument("--compare", metavar="JSONL", help="earlier run to compare median_us against")
+    ap.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    ap.add_argument("--write-fixtures", metavar="DIR", help="write synthetic feeds for --sizes and exit")
+    args = ap.parse_args(argv)
+
+    if args.write_fixtures:
+        os.makedirs(args.write_fixtures, exist_ok=True)
+        for n in args.sizes:
+            with open(os.path.join(args.write_fixtures, f"synthetic_{n}.ics"), "w", encoding="utf-8", newline="") as f:
+                f.write(synthetic_ics(n))
+        return 0
+
+    groups = {"parsing": lambda: bench_parsing(args.sizes), "slots": lambda: bench_slots(args.sizes),
+              "bandit": bench_bandit, "signals": lambda: bench_signals(args.sizes), "render": bench_render}
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {_key(r): r for r in map(json.loads, filter(str.strip, f)) if "bench" in r}
+    meta = _meta(); regressions = 0
+    out = open(args.out, "a", encoding="utf-8") if args.out else None
+    try:
+        for group in args.only or groups:
+            for rec in groups[group]():
+                rec = {**rec, **meta}
+                base = baseline.get(_key(rec))
+                if base:
+                    rec["ratio"] = round(rec["median_us"] / max(base["median_us"], 1e-9), 3)
+                    if rec["ratio"] >= args.threshold: rec["regression"] = True; regressions += 1
+                line = json.dumps(rec)
+                print(line, flush=True)
+                if out: out.write(line + "\n")
+    finally:
+        if out: out.close()
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# CalmSync scheduling engine (Streamlit-free helpers used by stressapp.py)
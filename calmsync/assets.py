@@ -0,0 +1,67 @@
+# CSS asset pipeline: each page's stylesheet + the pastel overlay, minified and
+# deduplicated once per process and rebuilt only when a source file's mtime changes.
+import os
+import re
+import threading
+
+ASSET_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OVERLAY = "overlay.css"
+PAGE_STYLESHEETS = {"initial": "initial.css", "home": "homepage.css", "accept": "homepage.css", "rec": "homepage.css"}
+DEFAULT_STYLESHEET = "afterquestions.css"
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_SPACE = re.compile(r"\s+")
+_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+_cache = {}  # stylesheet name -> ((mtime, overlay mtime), "<style>…</style>")
+_lock = threading.Lock()
+
+
+def read_css_file(name: str) -> str:
+    try:
+        with open(os.path.join(ASSET_DIR, name), "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception:
+        return ""
+
+def minify_css(css: str) -> str:
+    css = _SPACE.sub(" ", _COMMENT.sub("", css))
+    return _PUNCT.sub(r"\1", css).replace(";}", "}").strip()
+
+def _top_level_rules(css: str):
+    depth = 0; start = 0
+    for i, ch in enumerate(css):
+        if ch == "{": depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                yield css[start:i + 1]; start = i + 1
+        elif ch == ";" and depth == 0:  # @import / @charset
+            yield css[start:i + 1]; start = i + 1
+    if css[start:].strip(): yield css[start:]
+
+def dedupe_css(css: str) -> str:
+    """Drop repeated top-level rules, keeping the last copy so the cascade is unchanged."""
+    rules = list(_top_level_rules(css)); seen = set(); out = []
+    for rule in reversed(rules):
+        if rule in seen: continue
+        seen.add(rule); out.append(rule)
+    return "".join(reversed(out))
+
+def _mtime(name: str):
+    try:
+        return os.stat(os.path.join(ASSET_DIR, name)).st_mtime_ns
+    except OSError:
+        return None
+
+def page_style(page: str) -> str:
+    """Ready-to-inject <style> block for `page` (stylesheet first, overlay wins)."""
+    name = PAGE_STYLESHEETS.get(page, DEFAULT_STYLESHEET)
+    key = (_mtime(name), _mtime(OVERLAY))
+    hit = _cache.get(name)
+    if hit is not None and hit[0] == key: return hit[1]
+    with _lock:
+        css = dedupe_css(minify_css(read_css_file(name) + "\n" + read_css_file(OVERLAY)))
+        block = f"<style>{css}</style>"
+        _cache[name] = (key, block)
+    return block
@@ -0,0 +1,117 @@
+# Bandit math (epsilon-greedy + softmax over incremental-mean values), shared by the
+# live app and the offline simulator so tuning results carry over one-to-one.
+# ContextTables adds per-context values (time of day, weekday, weather, stress) on top
+# of the overall table, falling back to it until a context has seen enough pulls.
+import math
+from array import array
+from collections import OrderedDict
+from random import randint, random
+
+EXP_WEIGHT = 0.2     # reward shaping: weight of the experience rating…
+EXP_NEUTRAL = 5.0    # …around this neutral point
+MIN_TAU = 1e-6
+CONTEXT_MIN_N = 3    # pulls of an activity in a context before its own value is trusted
+CONTEXT_BUCKETS = 3 * 2 * 2 * 2   # distinct context_key() values
+MAX_CONTEXTS = CONTEXT_BUCKETS  # per-user cap (12 B per activity each); LRU-evicted beyond it
+
+
+def reward(delta_stress, exp_rating, exp_weight=EXP_WEIGHT):
+    """Stress delta (−5…+5) plus shaped experience rating (1…10); works on floats and arrays."""
+    return delta_stress + exp_weight * (exp_rating - EXP_NEUTRAL)
+
+def choose(table, favs, epsilon=0.05, tau=0.8):
+    """Pick one of `favs` from a {"activity": {"n", "value"}} table; returns (activity, scores)."""
+    scores = [(a, table.get(a, {"value": 0})["value"]) for a in favs]
+    if not scores: return None, {}
+    if random() < epsilon:
+        return scores[randint(0, len(scores) - 1)][0], dict(scores)
+    m = max(s for _, s in scores); exps = [(a, math.exp((s - m) / max(MIN_TAU, tau))) for a, s in scores]
+    tot = sum(v for _, v in exps)
+    r = random(); cum = 0
+    for a, v in exps:
+        cum += v / tot
+        if r <= cum: return a, dict(scores)
+    return exps[-1][0], dict(scores)
+
+def update(table, activity, r):
+    """Fold reward `r` into the activity's running mean."""
+    stt = table.setdefault(activity, {"n": 0, "value": 0.0})
+    n = stt["n"] + 1
+    stt["value"] += (r - stt["value"]) / n
+    stt["n"] = n
+
+
+def context_key(when, precip: float, wind: float, sma=None, threshold: float = 50.0) -> str:
+    """Discretised context, e.g. "afternoon|weekday|dry|low" (3 × 2 × 2 × 2 buckets)."""
+    part = "morning" if when.hour < 12 else "afternoon" if when.hour < 17 else "evening"
+    week = "weekend" if when.weekday() >= 5 else "weekday"
+    sky = "wet" if precip >= 0.5 or wind >= 10.0 else "dry"
+    stress = "low" if sma is not None and sma < threshold else "ok"
+    return f"{part}|{week}|{sky}|{stress}"
+
+
+class ContextTables:
+    """Per-context {"n", "value"} stats as compact arrays with one slot per activity.
+
+    Each context costs 12 bytes per activity (array('I') counts + array('d') means);
+    at most `max_contexts` are kept, evicting the least recently used, so a user's model
+    stays bounded however many contexts they pass through.
+    """
+    __slots__ = ("acts", "slot", "contexts", "max_contexts")
+
+    def __init__(self, acts=(), max_contexts: int = MAX_CONTEXTS):
+        self.acts = list(acts); self.slot = {a: i for i, a in enumerate(self.acts)}
+        self.contexts = OrderedDict()    # key -> (counts, values), oldest use first
+        self.max_contexts = max_contexts
+
+    def __len__(self):
+        return len(self.contexts)
+
+    def _arm(self, activity: str) -> int:
+        i = self.slot.get(activity)
+        if i is None:
+            i = self.slot[activity] = len(self.acts); self.acts.append(activity)
+            for n, v in self.contexts.values(): n.append(0); v.append(0.0)
+        return i
+
+    def _get(self, key: str, create: bool = False):
+        stats = self.contexts.get(key)
+        if stats is not None:
+            self.contexts.move_to_end(key)
+        elif create:
+            k = len(self.acts)
+            stats = self.contexts[key] = (array("I", bytes(4 * k)), array("d", bytes(8 * k)))
+            while len(self.contexts) > self.max_contexts: self.contexts.popitem(last=False)
+        return stats
+
+    def values(self, key: str, overall: dict, favs, min_n: int = CONTEXT_MIN_N) -> dict:
+        """{activity: {"n", "value"}} for `favs`: the context's own stats where it has at least
+        `min_n` pulls, the overall table's otherwise. O(len(favs))."""
+        stats = self._get(key); out = {}
+        for a in favs:
+            i = self.slot.get(a)
+            if stats is not None and i is not None and stats[0][i] >= min_n:
+                out[a] = {"n": stats[0][i], "value": stats[1][i]}
+            else:
+                out[a] = overall.get(a, {"n": 0, "value": 0.0})
+        return out
+
+    def choose(self, key: str, overall: dict, favs, epsilon=0.05, tau=0.8):
+        return choose(self.values(key, overall, favs), favs, epsilon, tau)
+
+    def update(self, key: str, activity: str, r: float):
+        i = self._arm(activity)
+        n, v = self._get(key, create=True)
+        n[i] += 1
+        v[i] += (r - v[i]) / n[i]
+
+    def to_json(self) -> dict:
+        return {"acts": self.acts, "contexts": [[k, list(n), list(v)] for k, (n, v) in self.contexts.items()]}
+
+    @classmethod
+    def from_json(cls, d: dict, max_contexts: int = MAX_CONTEXTS):
+        ct = cls(d.get("acts", ()), max_contexts); k = len(ct.acts)
+        for key, n, v in d.get("contexts", ())[-max_contexts:]:
+            if len(n) == len(v) <= k:
+                ct.contexts[key] = (array("I", n + [0] * (k - len(n))), array("d", v + [0.0] * (k - len(v))))
+        return ct
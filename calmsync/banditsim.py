@@ -0,0 +1,136 @@
+"""Offline bandit simulator and replay harness.
+
+Holds thousands of simulated users' {"n", "value"} tables as (users × arms) NumPy arrays
+and runs the live policy (calmsync.bandit: epsilon-greedy + softmax, incremental mean,
+shaped reward) for many simulated days in batched steps.
+
+    python -m calmsync.banditsim --users 5000 --days 90 --epsilon 0.02 0.05 0.1 --tau 0.5 0.8
+    python -m calmsync.banditsim --replay feedback.jsonl     # {"user", "activity", "delta", "exp"} per line
+
+Prints one JSON object per configuration.
+"""
+import argparse
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+
+from calmsync.bandit import EXP_WEIGHT, MIN_TAU, reward
+
+
+def choose_batch(values, epsilon, tau, rng):
+    """Vectorised bandit.choose: one arm per row of `values` (users × arms)."""
+    users, arms = values.shape
+    explore = rng.random(users) < epsilon
+    w = np.exp((values - values.max(axis=1, keepdims=True)) / max(MIN_TAU, tau))
+    cum = np.cumsum(w / w.sum(axis=1, keepdims=True), axis=1)
+    greedy = np.minimum((cum < rng.random(users)[:, None]).sum(axis=1), arms - 1)  # first arm with r <= cum
+    return np.where(explore, rng.integers(0, arms, users), greedy)
+
+def update_batch(n, values, arms, rewards):
+    """Vectorised bandit.update for one decision per user."""
+    rows = np.arange(len(arms))
+    n[rows, arms] += 1
+    values[rows, arms] += (rewards - values[rows, arms]) / n[rows, arms]
+
+
+class Population:
+    """Simulated users: per-(user, arm) mean stress delta and experience rating, plus noise.
+
+    Feedback is drawn like the feedback page's sliders: integers, delta in −5…5, rating in 1…10.
+    """
+
+    def __init__(self, users, arms, seed=0, noise=1.5):
+        rng = np.random.default_rng(seed)
+        self.users, self.arms, self.noise = users, arms, noise
+        self.delta_mean = np.clip(rng.normal(0.5, 1.5, (users, arms)), -5, 5)
+        self.exp_mean = np.clip(rng.normal(6.0, 1.5, (users, arms)), 1, 10)
+
+    def feedback(self, arms, rng):
+        rows = np.arange(self.users)
+        delta = np.clip(np.rint(self.delta_mean[rows, arms] + rng.normal(0, self.noise, self.users)), -5, 5)
+        exp = np.clip(np.rint(self.exp_mean[rows, arms] + rng.normal(0, self.noise, self.users)), 1, 10)
+        return delta, exp
+
+
+def simulate(pop, epsilon=0.05, tau=0.8, days=60, exp_weight=EXP_WEIGHT, seed=1):
+    """Run `days` decisions per user; report regret against the best arm and convergence."""
+    rng = np.random.default_rng(seed)
+    n = np.zeros((pop.users, pop.arms), dtype=np.int64)
+    values = np.zeros((pop.users, pop.arms))
+    expected = reward(pop.delta_mean, pop.exp_mean, exp_weight)
+    best = expected.argmax(axis=1); best_r = expected.max(axis=1); best_stress = pop.delta_mean.max(axis=1)
+    rows = np.arange(pop.users)
+    regret = np.empty(days); stress_regret = np.empty(days); converged = np.empty(days)
+    t0 = time.perf_counter()
+    for d in range(days):
+        arms = choose_batch(values, epsilon, tau, rng)
+        delta, exp = pop.feedback(arms, rng)
+        update_batch(n, values, arms, reward(delta, exp, exp_weight))
+        regret[d] = (best_r - expected[rows, arms]).mean()
+        stress_regret[d] = (best_stress - pop.delta_mean[rows, arms]).mean()
+        converged[d] = (values.argmax(axis=1) == best).mean()
+    hit = np.flatnonzero(converged >= 0.9)
+    return {
+        "epsilon": epsilon, "tau": tau, "exp_weight": exp_weight,
+        "users": pop.users, "arms": pop.arms, "days": days,
+        "cum_regret_per_user": round(float(regret.sum()), 4),
+        "final_regret_per_day": round(float(regret[-1]), 4),
+        "cum_stress_regret_per_user": round(float(stress_regret.sum()), 4),
+        "converged_final": round(float(converged[-1]), 4),
+        "days_to_90pct_converged": int(hit[0]) + 1 if hit.size else None,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+def replay(users, arms, delta, exp, n_users, n_arms, exp_weight=EXP_WEIGHT):
+    """Rebuild (n, value) arrays from logged feedback; equals applying bandit.update in log order."""
+    cell = np.asarray(users) * n_arms + np.asarray(arms)
+    n = np.bincount(cell, minlength=n_users * n_arms)
+    sums = np.bincount(cell, weights=reward(np.asarray(delta, float), np.asarray(exp, float), exp_weight),
+                       minlength=n_users * n_arms)
+    values = np.divide(sums, n, out=np.zeros_like(sums), where=n > 0)
+    return n.reshape(n_users, n_arms), values.reshape(n_users, n_arms)
+
+def to_tables(n, values, activities):
+    """Per-user {"activity": {"n", "value"}} tables in the live model's format."""
+    return [{a: {"n": int(n[u, i]), "value": float(values[u, i])} for i, a in enumerate(activities)}
+            for u in range(n.shape[0])]
+
+def replay_file(path, exp_weight=EXP_WEIGHT):
+    users, acts, rows = {}, {}, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip(): continue
+            rec = json.loads(line)
+            rows.append((users.setdefault(rec["user"], len(users)), acts.setdefault(rec["activity"], len(acts)),
+                         rec["delta"], rec["exp"]))
+    if not rows: return {}
+    u, a, d, e = (np.array(col) for col in zip(*rows))
+    n, values = replay(u, a, d, e, len(users), len(acts), exp_weight)
+    return dict(zip(users, to_tables(n, values, list(acts))))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=5000)
+    ap.add_argument("--arms", type=int, default=5, help="favourite activities per user")
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--epsilon", type=float, nargs="+", default=[0.05])
+    ap.add_argument("--tau", type=float, nargs="+", default=[0.8])
+    ap.add_argument("--exp-weight", type=float, nargs="+", default=[EXP_WEIGHT])
+    ap.add_argument("--noise", type=float, default=1.5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--replay", metavar="JSONL", help="rebuild tables from logged feedback instead")
+    args = ap.parse_args(argv)
+    if args.replay:
+        json.dump(replay_file(args.replay, args.exp_weight[0]), sys.stdout); print(); return
+    pop = Population(args.users, args.arms, seed=args.seed, noise=args.noise)
+    for eps, tau, w in itertools.product(args.epsilon, args.tau, args.exp_weight):
+        print(json.dumps(simulate(pop, eps, tau, args.days, w, seed=args.seed + 1)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
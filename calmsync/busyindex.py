@@ -0,0 +1,172 @@
+# Busy calendar storage and index, array-backed so one feed's buffers can be shared
+# read-only by every session that uses it.
+#   • EventTable: busy events sorted by (start, end) as epoch-second array('q') columns
+#     plus summary ids into a per-table interned string table; tables from several feeds
+#     combine with a k-way heap merge that drops events repeated across feeds
+#   • BusyIndex: the same blocks merged into disjoint intervals, with bisect lookups
+import heapq
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import repeat
+
+
+def _ts(dt: datetime) -> int:
+    return int(dt.timestamp() // 1)
+
+def _ts_ceil(dt: datetime) -> int:
+    return -int(-dt.timestamp() // 1)
+
+def _row_key(row):
+    return row[0], row[1]
+
+
+class EventTable:
+    """Read-only busy events (start, end, summary) sorted by (start, end)."""
+    __slots__ = ("starts", "ends", "titles", "strings", "max_len", "_index", "_days")
+
+    def __init__(self, events=()):
+        self._fill(sorted(((_ts(s), _ts(e), t) for s, e, t in events), key=_row_key))
+
+    @classmethod
+    def merge(cls, tables):
+        """One table from several via a k-way heap merge (no re-sort). Rows that are exact
+        duplicates across tables (same start, end and summary) are deduplicated: each is kept
+        as many times as the table holding the most copies has it, so one feed's own repeats stay."""
+        tables = [t for t in tables if len(t)]
+        if len(tables) == 1: return tables[0]
+        out = []; last = None; most = {}; seen = {}   # per (start, end): title -> max copies in one table so far
+        for row in heapq.merge(*(t._rows(k) for k, t in enumerate(tables)), key=_row_key):
+            if row[:2] != last: last = row[:2]; most.clear(); seen.clear()
+            n = seen[row[2:]] = seen.get(row[2:], 0) + 1
+            if n > most.get(row[2], 0): most[row[2]] = n; out.append(row)
+        merged = cls.__new__(cls)
+        merged._fill(out)
+        return merged
+
+    def _rows(self, *tag):
+        strings = self.strings
+        return zip(self.starts, self.ends, (strings[i] for i in self.titles), *(repeat(v) for v in tag))
+
+    def _fill(self, rows):
+        ids = {}; strings = []
+        self.starts = array("q", (r[0] for r in rows)); self.ends = array("q", (r[1] for r in rows))
+        titles = array("I")
+        for r in rows:
+            t = r[2]; i = ids.get(t)
+            if i is None: i = ids[t] = len(strings); strings.append(sys.intern(t))
+            titles.append(i)
+        self.titles = titles; self.strings = tuple(strings)
+        self.max_len = max((e - s for s, e in zip(self.starts, self.ends)), default=0)
+        self._index = None; self._days = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.starts.itemsize * len(self.starts) * 2 + self.titles.itemsize * len(self.titles)
+                + sum(len(s) + 49 for s in self.strings))
+
+    @property
+    def index(self) -> "BusyIndex":
+        """Merged-interval index over this table, built on first use and shared with the table."""
+        if self._index is None: self._index = BusyIndex.from_arrays(self.starts, self.ends)
+        return self._index
+
+    def day_rows(self, day_start: datetime, day_end: datetime) -> tuple:
+        """on_day() rows, indexed by day on first use and shared with the table."""
+        key = (_ts(day_start), _ts(day_end))
+        if self._days is None: self._days = {}
+        rows = self._days.get(key)
+        if rows is None: rows = self._days[key] = tuple(self.on_day(day_start, day_end))
+        return rows
+
+    def count_between(self, lo: datetime, hi: datetime) -> int:
+        """Events overlapping [lo, hi] (inclusive on both ends)."""
+        a, b = _ts(lo), _ts(hi); starts, ends = self.starts, self.ends
+        i = bisect_left(starts, a - self.max_len)   # nothing earlier can still be running at `a`
+        return sum(1 for k in range(i, bisect_right(starts, b)) if ends[k] >= a)
+
+    def on_day(self, day_start: datetime, day_end: datetime):
+        """Yield (start, end, summary) for events starting or ending in [day_start, day_end)."""
+        a, b = _ts(day_start), _ts(day_end); tz = day_start.tzinfo
+        starts, ends, titles, strings = self.starts, self.ends, self.titles, self.strings
+        for i in range(bisect_left(starts, a - self.max_len), bisect_left(starts, b)):
+            if a <= starts[i] < b or a <= ends[i] < b:
+                yield datetime.fromtimestamp(starts[i], tz), datetime.fromtimestamp(ends[i], tz), strings[titles[i]]
+
+
+class BusyIndex:
+    """Merged busy intervals (epoch seconds) sorted by start; `ends` is sorted too since blocks are disjoint."""
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, events=()):
+        rows = sorted((_ts(s), _ts(e)) for s, e, *_ in events)
+        self.starts, self.ends = self._merge(rows)
+
+    @classmethod
+    def from_arrays(cls, starts, ends):
+        """Build from start-sorted epoch columns (e.g. an EventTable's)."""
+        idx = cls.__new__(cls)
+        idx.starts, idx.ends = cls._merge(zip(starts, ends))
+        return idx
+
+    @staticmethod
+    def _merge(rows):
+        starts, ends = array("q"), array("q")
+        for s, e in rows:
+            if e <= s: continue
+            if ends and s <= ends[-1]:
+                if e > ends[-1]: ends[-1] = e
+            else:
+                starts.append(s); ends.append(e)
+        return starts, ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        i = bisect_right(self.ends, _ts(start))     # first block ending after `start`
+        return i < len(self.starts) and self.starts[i] < _ts_ceil(end)
+
+    def _gaps(self, lo: int, hi: int):
+        starts, ends = self.starts, self.ends
+        i = bisect_right(ends, lo); cur = lo
+        while i < len(starts) and starts[i] < hi:
+            if starts[i] > cur: yield cur, starts[i]
+            if ends[i] > cur: cur = ends[i]
+            i += 1
+        if cur < hi: yield cur, hi
+
+    def free_gaps(self, lo: datetime, hi: datetime):
+        """Yield free (start, end) gaps inside [lo, hi) in O(log n + k)."""
+        tz = lo.tzinfo
+        for gs, ge in self._gaps(_ts(lo), _ts(hi)):
+            yield datetime.fromtimestamp(gs, tz), datetime.fromtimestamp(ge, tz)
+
+    def slots(self, lo: datetime, hi: datetime, duration: timedelta, step: timedelta, not_before: datetime = None):
+        """Yield starts on the `lo + k*step` grid whose `duration` window fits in a free gap."""
+        base, tz = _ts(lo), lo.tzinfo
+        st, du = int(step.total_seconds()), int(duration.total_seconds())
+        nb = _ts_ceil(not_before) if not_before is not None else None
+        for gs, ge in self._gaps(base, _ts(hi)):
+            if nb is not None and nb > gs: gs = nb
+            t = base - ((base - gs) // st) * st          # ceil onto the grid
+            while t + du <= ge:
+                yield datetime.fromtimestamp(t, tz)
+                t += st
+
+    def slot_table(self, lo: datetime, hi: datetime, durations, step: timedelta):
+        """{duration: [starts]} for several durations from a single walk over the free gaps."""
+        base, tz, st = _ts(lo), lo.tzinfo, int(step.total_seconds())
+        secs = [(d, int(d.total_seconds())) for d in durations]
+        table = {d: [] for d in durations}
+        for gs, ge in self._gaps(base, _ts(hi)):
+            first = base - ((base - gs) // st) * st
+            for d, du in secs:
+                out = table[d]; t = first
+                while t + du <= ge:
+                    out.append(datetime.fromtimestamp(t, tz)); t += st
+        return table
@@ -0,0 +1,346 @@
+# Streamlit-free scheduling core: calendar loading, slot search, bandit and ICS export.
+# Every function takes the per-user state explicitly — a plain dict in a worker, batch
+# job or test, `st.session_state` in the app — so the pages in stressapp.py stay thin.
+# Feed and weather caches are imported on first use; nothing here loads Streamlit, and
+# `requests` is only imported when a download actually happens.
+import heapq
+import re
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from random import randint, random
+from zoneinfo import ZoneInfo
+
+from calmsync import bandit, metrics, visuals
+from calmsync.busyindex import EventTable
+
+TZ = ZoneInfo("Europe/Amsterdam")
+SMA_THRESHOLD = 50  # trigger a break when SMA < 50
+NO_EVENTS = EventTable()
+DEFAULT_ACTIVITIES = ("Walk outside", "Stretch", "Breathe 4-7-8", "Tea break", "Power nap", "Quick tidy-up",
+                      "Listen to calm track")
+DEFAULT_WEATHER = {"precip": 0.0, "wind": 3.0}
+SLOT_DURATIONS = tuple(range(15, 61, 5))  # every value the accept-page slider can take
+SLOT_STEP_MIN = 30
+RANK_DAYS = 3          # horizon of the ranked suggestions
+LOAD_DEADLINE_S = 8.0  # home page never waits longer than this for daily data
+FEED_TIMEOUT_S = 10.0  # per calendar feed
+
+
+# ── state ────────────────────────────────────────────────────────────────────
+def init_state(state):
+    """Fill in defaults for every engine key; existing values are kept."""
+    state.setdefault("page", "initial")
+    state.setdefault("all_activities", list(DEFAULT_ACTIVITIES))
+    state.setdefault("favorite_activities", [])
+    state.setdefault("model", {"overall": {}})
+    if "context_model" not in state: state["context_model"] = bandit.ContextTables(state["all_activities"])
+    state.setdefault("last_recommendation", None)
+    state.setdefault("epsilon", 0.05); state.setdefault("tau", 0.8)
+    state.setdefault("calendar_urls", []); state.setdefault("calendar_events", NO_EVENTS)
+    state.setdefault("calendar_last_status", ""); state.setdefault("calendar_feed_status", {})
+    state.setdefault("calendar_index", NO_EVENTS.index)  # merged busy blocks of calendar_events
+    state.setdefault("demo_day_offset", 0)
+    state.setdefault("sma_today", None)                 # SMA drives trigger
+    state.setdefault("fitbit_series_today_key", None)   # cache key
+    state.setdefault("ics_exports", {})                 # calmsync.icsexport registry: {uid: [digest, seq, stamp]}
+    state.setdefault("ics_inbox", [])                   # registries stamped by deferred downloads, see plan_snapshot
+    state.setdefault("html_cache", {})                  # {name: (key, html)}, see cached_html()
+    ensure_activities(state)
+    return state
+
+def ensure_activities(state):
+    for a in state["all_activities"]:
+        state["model"]["overall"].setdefault(a, {"n": 0, "value": 0.0})
+
+def user_snapshot(state) -> dict:
+    """What is persisted per user (see calmsync.store)."""
+    return {"model": state["model"], "favorites": state["favorite_activities"], "activities": state["all_activities"],
+            "contexts": state["context_model"].to_json(), "exports": state["ics_exports"]}
+
+def restore_user(state, saved: dict):
+    state["model"] = saved["model"]; state["favorite_activities"] = saved["favorites"]
+    if saved.get("contexts"): state["context_model"] = bandit.ContextTables.from_json(saved["contexts"])
+    if saved.get("exports"): state["ics_exports"] = saved["exports"]
+    state["all_activities"] = list(dict.fromkeys(state["all_activities"] + saved["activities"]))
+    ensure_activities(state)
+
+def now_local(state) -> datetime:
+    return datetime.now(TZ) + timedelta(days=state.get("demo_day_offset", 0))
+
+
+# ── calendar ─────────────────────────────────────────────────────────────────
+def store_calendar_events(state, table: EventTable):
+    # Tables come shared from the feed cache: never mutate them in place.
+    if state.get("calendar_events") is table: return   # unchanged: keep the version and what's cached on it
+    state["calendar_events"] = table
+    state["calendar_index"] = table.index
+    state["calendar_version"] = state.get("calendar_version", 0) + 1
+
+def load_calendar(url: str, nowr: datetime, force: bool = False) -> EventTable:
+    """Shared busy-event table covering [nowr, nowr+30d]; touches no state, so it can run on the I/O pool."""
+    from calmsync.feedcache import calendar_cache
+    day0 = nowr.replace(hour=0, minute=0, second=0, microsecond=0)  # day-aligned so sessions share entries
+    return calendar_cache.get(url.strip(), day0, day0 + timedelta(days=31), force=force)
+
+def parse_calendar_urls(text: str) -> list:
+    """URLs from free text (one per line, or comma/space separated), deduplicated in order."""
+    return list(dict.fromkeys(u for u in re.split(r"[\s,]+", text or "") if u))
+
+def feed_label(url: str) -> str:
+    """Short name for status lines: the file name of the feed, else its host."""
+    host, _, path = url.split("?", 1)[0].rstrip("/").split("//", 1)[-1].partition("/")
+    return path.rsplit("/", 1)[-1] or host
+
+def feed_sources(urls, nowr: datetime, force: bool = False, timeout: float = FEED_TIMEOUT_S) -> dict:
+    """gather() sources loading each feed concurrently, keyed "calendar:<url>"."""
+    return {f"calendar:{u}": (lambda u=u: load_calendar(u, nowr, force), timeout) for u in urls}
+
+def apply_calendars(state, urls, results: dict, errors: dict, nowr: datetime, keep_on_failure: bool = False):
+    """Merge the feeds that loaded into one busy set and report every feed's status.
+
+    `results`/`errors` come from gather() over feed_sources(). When every feed failed the
+    blocks are cleared, or left as they were with `keep_on_failure`.
+    """
+    tables, feeds, parts = [], {}, []
+    for u in urls:
+        k = f"calendar:{u}"
+        if k in results:
+            tables.append(results[k]); n = results[k].count_between(nowr, nowr + timedelta(days=30))
+            feeds[u] = f"{n} busy events"
+        else:
+            feeds[u] = f"failed ({errors.get(k, 'not loaded')})"
+        parts.append(f"{feed_label(u)}: {feeds[u]}")
+    state["calendar_feed_status"] = feeds
+    if tables:
+        from calmsync.feedcache import calendar_cache
+        table = calendar_cache.merged(tables)
+        store_calendar_events(state, table)
+        status = calendar_status(table, nowr)
+        if len(urls) > 1 or len(tables) < len(urls):
+            status = f"{status[:-1]} from {len(tables)} of {len(urls)} calendars — " + " · ".join(parts)
+    elif keep_on_failure:  # keep yesterday's blocks rather than showing an empty day
+        status = "Calendar refresh failed — " + " · ".join(parts)
+    else:
+        store_calendar_events(state, NO_EVENTS)
+        status = "Failed to load calendar — " + " · ".join(parts)
+    state["calendar_last_status"] = status
+
+def calendar_status(table: EventTable, nowr: datetime) -> str:
+    return f"Loaded {table.count_between(nowr, nowr + timedelta(days=30))} busy events."
+
+@metrics.timed("fetch_and_cache_calendar")
+def refresh_calendar(state, urls, force: bool = False):
+    """Load every feed in `urls` concurrently into `state` (none clears it); per-feed status in calendar_last_status."""
+    if not urls:
+        state["calendar_last_status"] = ""; state["calendar_feed_status"] = {}
+        store_calendar_events(state, NO_EVENTS); return
+    from calmsync.net import gather
+    nowr = now_local(state)
+    results, errors = gather(feed_sources(urls, nowr, force))
+    apply_calendars(state, urls, results, errors, nowr)
+
+def overlaps_busy(state, start_dt: datetime, end_dt: datetime) -> bool:
+    return state["calendar_index"].overlaps(start_dt, end_dt)
+
+def todays_calendar_lines(state, day_dt: datetime):
+    events = state["calendar_events"]
+    if not events: return []
+    day = day_dt.date()
+    start = datetime(day.year, day.month, day.day, tzinfo=TZ)
+    rows = heapq.nsmallest(4, events.day_rows(start, start + timedelta(days=1)),
+                           key=lambda r: (r[0], r[1], r[2] or "Busy"))   # format only what is shown
+    return [f"<span class='when'>{s.strftime('%H:%M')}–{e.strftime('%H:%M')}</span> · {title or 'Busy'}"
+            for s, e, title in rows]
+
+def cached_html(state, name: str, key, build):
+    """Finished HTML block `name`, rebuilt by build() only when `key` changes (one entry per name)."""
+    hit = state["html_cache"].get(name)
+    if hit is not None and hit[0] == key: return hit[1]
+    html = build(); state["html_cache"][name] = (key, html)
+    return html
+
+def home_overview(state, sma, day_dt: datetime) -> str:
+    """Home 'Stress Overview' HTML, cached on (score, calendar version, day)."""
+    score = 50 if sma is None else max(0, min(int(sma), 100))
+    connected = bool(state.get("calendar_urls"))
+    key = (score, state.get("calendar_version", 0), day_dt.date(), connected)
+    return cached_html(state, "home_overview", key, lambda: visuals.overview_html(
+        score, todays_calendar_lines(state, day_dt) if connected else (), connected))
+
+# ── slots ────────────────────────────────────────────────────────────────────
+def day_bounds(day):
+    return (datetime(day.year, day.month, day.day, 8, 0, 0, tzinfo=TZ),
+            datetime(day.year, day.month, day.day, 22, 0, 0, tzinfo=TZ))
+
+@metrics.timed("slot_table")
+def day_slot_table(state, day):
+    """{duration_min: [starts]} for `day`, built once per calendar version and day (no "now" cutoff)."""
+    key = (state.get("calendar_version", 0), day)
+    cached = state.get("slot_table")
+    if cached and cached[0] == key: return cached[1]
+    earliest, latest = day_bounds(day)
+    durs = {timedelta(minutes=d): d for d in SLOT_DURATIONS}
+    raw = state["calendar_index"].slot_table(earliest, latest, list(durs), timedelta(minutes=SLOT_STEP_MIN))
+    table = {durs[d]: v for d, v in raw.items()}
+    state["slot_table"] = (key, table)
+    return table
+
+@metrics.timed("slot_search")
+def list_available_slots(state, day_dt: datetime, duration_min: int, step_min: int = SLOT_STEP_MIN,
+                         nowr: datetime = None):
+    day = day_dt.date(); nowr = nowr or now_local(state)
+    cutoff = nowr if day == nowr.date() else None
+    if step_min == SLOT_STEP_MIN and duration_min in SLOT_DURATIONS:
+        slots = day_slot_table(state, day)[duration_min]
+        return slots[bisect_left(slots, cutoff):] if cutoff else list(slots)
+    earliest, latest = day_bounds(day)
+    step = timedelta(minutes=step_min); dur = timedelta(minutes=duration_min)
+    return list(state["calendar_index"].slots(earliest, latest, dur, step, not_before=cutoff))
+
+@metrics.timed("slot_rank")
+def rank_slots(state, activity: str, duration_min: int, days: int = RANK_DAYS, k: int = 5, nowr: datetime = None):
+    """Top-k [(start, score, parts)] over the next `days` days, scored on gap room, the hourly
+    forecast (outdoor activities only) and the current stress score; see calmsync.ranking."""
+    from calmsync import ranking
+    nowr = nowr or now_local(state); idx = state["calendar_index"]
+    outdoor = ranking.is_outdoor(activity)
+    h0 = nowr.replace(minute=0, second=0, microsecond=0); precip = wind = None
+    if outdoor:
+        from calmsync.weather import weather_cache
+        series = weather_cache.hourly(h0, (days + 1) * 24)
+        if series: precip, wind = (list(c) for c in zip(*series))
+    top = ranking.rank(idx.starts, idx.ends, nowr, duration_min * 60, days=days, step_s=SLOT_STEP_MIN * 60,
+                       precip=precip, wind=wind, hour0=int(h0.timestamp()), sma=current_sma(state),
+                       threshold=SMA_THRESHOLD, outdoor=outdoor, k=k)
+    return [(datetime.fromtimestamp(ts, TZ), score, parts) for ts, score, parts in top]
+
+
+# ── ICS export ───────────────────────────────────────────────────────────────
+def make_ics(state, activity: str, start_dt: datetime, duration_min: int) -> bytes:
+    """Single-break calendar. One UID per user and day, so re-planning the day's break updates it."""
+    from calmsync.icsexport import calendar_bytes, stamp_events
+    return calendar_bytes(stamp_events(state["ics_exports"], state.get("user_id"),
+                                       (("break", activity, start_dt, duration_min),)))
+
+PLAN_KEYS = ("user_id", "model", "favorite_activities", "all_activities", "calendar_index", "accept_duration",
+             "demo_day_offset", "sma_today", "ics_exports")
+
+def plan_snapshot(state) -> dict:
+    """Copies of the keys week_plan() reads, so a deferred download can run on Streamlit's server
+    thread without touching `state`. The export registry it stamps is the snapshot's own; hand it
+    back with return_exports() and it is folded into `state` on the next snapshot (script thread)."""
+    absorb_exports(state)
+    snap = {k: state.get(k) for k in PLAN_KEYS}
+    snap["model"] = {"overall": {a: dict(s) for a, s in state["model"]["overall"].items()}}
+    snap["favorite_activities"] = list(state["favorite_activities"]); snap["all_activities"] = list(state["all_activities"])
+    snap["ics_exports"] = {u: list(rec) for u, rec in state["ics_exports"].items()}
+    snap["ics_inbox"] = state["ics_inbox"]   # list.append is the only cross-thread operation
+    return snap
+
+def return_exports(snap):
+    """Queue a snapshot's stamped registry for its session (called from the download thread)."""
+    snap["ics_inbox"].append({u: list(rec) for u, rec in snap["ics_exports"].items()})
+
+def absorb_exports(state):
+    """Fold registries handed back by deferred downloads into the session's; higher SEQUENCE wins."""
+    inbox, registry = state["ics_inbox"], state["ics_exports"]
+    while inbox:
+        for uid, rec in inbox.pop(0).items():
+            cur = registry.get(uid)
+            if cur is None or rec[1] > cur[1] or (rec[1] == cur[1] and rec[2] >= cur[2]): registry[uid] = rec
+
+def week_plan_ics(state, days: int = 7, duration_min: int = None) -> bytes:
+    """A week of recommended breaks (calmsync.icsexport.week_plan) as one calendar."""
+    from calmsync.icsexport import calendar_bytes, plan_events
+    return calendar_bytes(plan_events(state, days, duration_min), "Stress-Aware breaks")
+
+
+# ── daily data ───────────────────────────────────────────────────────────────
+def attach_signals(state, spec: str, on_aggregate=None):
+    """Start streaming the user's wearable samples from `spec` (see calmsync.signals.SOURCE);
+    None if the spec has no source for this user."""
+    from calmsync.signals import open_source, signal_hub
+    stream = signal_hub.get(state["user_id"])
+    if stream is not None: return stream
+    source = open_source(spec, state["user_id"])
+    if source is None: return None
+    samples, realtime = source
+    return signal_hub.attach(state["user_id"], samples, on_aggregate=on_aggregate, realtime=realtime)
+
+def signal_score(state):
+    """Latest rolling score from the user's signal stream (O(1)), or None if there is none yet."""
+    from calmsync.signals import signal_hub
+    stream = signal_hub.get(state.get("user_id", ""))
+    latest = stream.latest() if stream is not None else None
+    return round(latest[1]) if latest else None
+
+def current_sma(state):
+    """Score that drives the break trigger: the live signal when streaming, else today's demo value."""
+    live = signal_score(state)
+    return live if live is not None else state.get("sma_today")
+
+def generate_demo_sma():
+    # 40% chance to be under threshold for demo variability
+    if random() < 0.4:
+        return randint(25, 49)  # low
+    return randint(55, 85)     # okay/good
+
+def fetch_weather(when: datetime):
+    from calmsync.weather import weather_cache
+    return weather_cache.at(when) or dict(DEFAULT_WEATHER)
+
+@metrics.timed("ensure_today_data")
+def ensure_today_data(state):
+    key = f"sma_{state.get('demo_day_offset', 0)}"
+    if state.get("fitbit_series_today_key") == key: return
+    from calmsync.net import gather
+    # Sources run concurrently on the shared I/O pool; add future stress-signal feeds here.
+    nowr = now_local(state); urls = state.get("calendar_urls", [])
+    sources = {"weather": (lambda: fetch_weather(nowr), 7.0), **feed_sources(urls, nowr)}
+    results, errors = gather(sources, deadline_s=LOAD_DEADLINE_S)
+
+    live = signal_score(state)
+    state["sma_today"] = live if live is not None else generate_demo_sma()
+    state["fitbit_series_today_key"] = key
+    state["weather"] = results.get("weather") or dict(DEFAULT_WEATHER)
+    if urls: apply_calendars(state, urls, results, errors, nowr, keep_on_failure=True)
+
+
+# ── bandit ───────────────────────────────────────────────────────────────────
+def current_context(state, when: datetime = None) -> str:
+    """Context bucket for `when` (default now): time of day, weekday, weather and stress."""
+    when = when or now_local(state); wx = fetch_weather(when)
+    return bandit.context_key(when, wx["precip"], wx["wind"], current_sma(state), SMA_THRESHOLD)
+
+def bandit_choose(state, favs, epsilon=0.05, tau=0.8, context: str = None):
+    """Choose among `favs` with the context's values where it has enough data, else the overall ones."""
+    if context is None: return bandit.choose(state["model"]["overall"], favs, epsilon, tau)
+    return state["context_model"].choose(context, state["model"]["overall"], favs, epsilon, tau)
+
+def recommend(state, favs, epsilon=0.05, tau=0.8) -> dict:
+    """{"activity", "context"} for the current context, as stored in last_recommendation."""
+    ctx = current_context(state)
+    act, _ = bandit_choose(state, favs, epsilon, tau, ctx)
+    return {"activity": act, "context": ctx}
+
+def bandit_update(state, activity, delta_stress, exp_rating, context: str = None) -> float:
+    """Fold one feedback into the session's model; returns the reward (for ModelStore.add_reward)."""
+    r = bandit.reward(float(delta_stress), float(exp_rating))
+    bandit.update(state["model"]["overall"], activity, r)
+    if context: state["context_model"].update(context, activity, r)
+    return r
+
+def expectation_text(state, activity):
+    s = state["model"]["overall"].get(activity, {"n": 0, "value": 0}); n = s["n"]; m = s["value"]
+    if n == 0: return "I don’t know much about this type of break yet — let’s see how it affects your stress."
+    if m <= -2: return "May increase stress for you; consider alternatives."
+    if m < -0.5: return "Tends to feel counterproductive in reducing stress, but you may try once again."
+    if m < 0.5: return "Mixed results so far — want to give it another shot?"
+    if m < 2.5: return "Expected to provide a gentle reduction in stress."
+    if m < 4: return "Expected to noticeably lower your stress."
+    return "Often provides a strong reduction in stress."
+
+def next_day(state):
+    state["demo_day_offset"] = state.get("demo_day_offset", 0) + 1
+    state["fitbit_series_today_key"] = None
+    state["last_recommendation"] = None
@@ -0,0 +1,133 @@
+# Process-wide calendar feed cache shared by every Streamlit session.
+#   • keyed by URL; each entry holds the busy blocks parsed for a day-aligned window as a
+#     read-only EventTable (+ its BusyIndex) that all sessions on that URL share
+#   • fresh for `ttl` seconds, then revalidated with ETag / Last-Modified (304 → reuse)
+#   • LRU eviction by entry count and an approximate memory budget
+#   • single-flight: concurrent sessions asking for one URL share a single download + parse;
+#     a URL's flight lock lives only while someone holds or waits for it
+#   • merged(): users with several feeds share one merged EventTable (+ BusyIndex) per
+#     combination of feed tables, instead of building one per session and refresh
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from calmsync import metrics
+from calmsync.busyindex import EventTable
+from calmsync.ics import iter_ics_events
+from calmsync.net import http_session
+
+class _Entry:
+    __slots__ = ("window", "events", "etag", "last_modified", "checked", "nbytes")
+
+    def __init__(self, window, events, etag, last_modified):
+        self.window = window; self.events = events
+        self.etag = etag; self.last_modified = last_modified
+        self.checked = time.monotonic()
+        self.nbytes = events.nbytes * 2  # + the merged index, at most the same size
+
+
+class CalendarCache:
+    def __init__(self, ttl=300.0, max_entries=256, max_bytes=64 * 2**20, timeout=10, max_merged=64):
+        self.ttl = ttl; self.max_entries = max_entries; self.max_bytes = max_bytes; self.timeout = timeout
+        self.max_merged = max_merged
+        self._merged = OrderedDict(); self._merge_lock = threading.Lock()   # table ids -> (tables, merged)
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0, "merged_hits": 0, "merged_builds": 0}
+        self._entries = OrderedDict(); self._bytes = 0
+        self._lock = threading.Lock(); self._flights = {}   # url -> [lock, holders + waiters]
+
+    def get(self, url: str, window_start, window_end, force: bool = False):
+        """Shared EventTable of the feed's busy events in the window; `force` skips the TTL."""
+        with self._flight(url):
+            with self._lock:
+                ent = self._entries.get(url)
+                if ent is not None: self._entries.move_to_end(url)
+            covers = ent is not None and ent.window[0] <= window_start and window_end <= ent.window[1]
+            if covers and not force and time.monotonic() - ent.checked < self.ttl:
+                self._count("hits"); metrics.incr("calendar_cache_hits")
+                return ent.events
+            headers = {}
+            if covers:
+                if ent.etag: headers["If-None-Match"] = ent.etag
+                if ent.last_modified: headers["If-Modified-Since"] = ent.last_modified
+            with metrics.span("calendar.fetch"), \
+                    http_session().get(url, timeout=self.timeout, stream=True, headers=headers) as r:
+                if covers and r.status_code == 304:
+                    ent.checked = time.monotonic(); self._count("not_modified")
+                    metrics.incr("calendar_cache_not_modified")
+                    return ent.events
+                r.raise_for_status()
+                lines = metrics.count_bytes(r.iter_lines())
+                parsed = [0]
+                def busy():
+                    for e in iter_ics_events(lines, window_start, window_end):
+                        parsed[0] += 1
+                        if e["busy"]: yield e["start"], e["end"], e["summary"]
+                with metrics.span("parse_ics"):   # the body is streamed, so this includes reading it
+                    events = EventTable(busy())
+                etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            events.index  # build the shared index once, inside the flight
+            self._count("misses"); metrics.incr("calendar_cache_misses")
+            metrics.incr("calendar_events_parsed", parsed[0]); metrics.incr("calendar_busy_events", len(events))
+            ent = _Entry((window_start, window_end), events, etag, last_modified)
+            self._store(url, ent)
+            return ent.events
+
+    def merged(self, tables) -> EventTable:
+        """Shared EventTable.merge(tables), keyed by the identities of the (read-only) feed tables.
+
+        The entry keeps the feed tables alive, so their ids can't be reused while it is cached;
+        concurrent sessions with the same feeds wait for one merge instead of each doing it.
+        """
+        tables = tuple(tables)
+        if len(tables) == 1: return tables[0]
+        key = tuple(map(id, tables))
+        with self._merge_lock:
+            hit = self._merged.get(key)
+            if hit is not None:
+                self._merged.move_to_end(key); self._count("merged_hits")
+                return hit[1]
+            table = EventTable.merge(tables)
+            table.index  # build the shared index once, under the lock
+            self._merged[key] = (tables, table); self._count("merged_builds")
+            while len(self._merged) > self.max_merged: self._merged.popitem(last=False)
+            return table
+
+    def invalidate(self, url: str = None):
+        with self._lock:
+            urls = [url] if url is not None else list(self._entries)
+            for u in urls:
+                ent = self._entries.pop(u, None)
+                if ent is not None: self._bytes -= ent.nbytes
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    @contextmanager
+    def _flight(self, url):
+        """Hold the URL's single-flight lock; it is dropped once nobody holds or waits for it."""
+        with self._lock:
+            flight = self._flights.get(url)
+            if flight is None: flight = self._flights[url] = [threading.Lock(), 0]
+            flight[1] += 1
+        try:
+            with flight[0]:
+                yield
+        finally:
+            with self._lock:
+                flight[1] -= 1
+                if not flight[1]: del self._flights[url]
+
+    def _store(self, url, ent):
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None: self._bytes -= old.nbytes
+            self._entries[url] = ent; self._bytes += ent.nbytes
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                u, ev = self._entries.popitem(last=False)
+                self._bytes -= ev.nbytes
+                self.stats["evictions"] += 1; metrics.incr("calendar_cache_evictions")
+
+
+calendar_cache = CalendarCache()
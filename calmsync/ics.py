@@ -0,0 +1,154 @@
+# ICS (iCalendar) parsing — streaming, line-at-a-time, with early window filtering.
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from calmsync.recurrence import iter_occurrences, parse_rrule
+
+TZ = ZoneInfo("Europe/Amsterdam")  # floating (no Z / TZID) times are Amsterdam-local
+MAX_LINE = 64 * 1024               # unfolded lines longer than this are truncated (huge DESCRIPTIONs)
+
+
+@lru_cache(maxsize=64)
+def _zone(tzid: str):
+    """ZoneInfo for a TZID parameter; unknown ids (e.g. Windows names) fall back to Amsterdam."""
+    try:
+        return ZoneInfo(tzid.strip().strip('"'))
+    except Exception:
+        return TZ
+
+@lru_cache(maxsize=16384)
+def _parse_ics_dt(val: str, tzid: str = None):
+    """Decode DATE / DATE-TIME values by slicing the fixed-width fields.
+
+    `YYYYMMDD` -> ("allday", start, end); `YYYYMMDDTHHMMSS[Z]` -> aware datetime in Amsterdam
+    time (UTC if Z, else TZID, else floating = Amsterdam). None if malformed. Memoised:
+    exported feeds repeat the same stamps and recurring boundaries thousands of times.
+    """
+    s = val.strip(); n = len(s)
+    try:
+        if n == 8 and s.isdigit():
+            start = datetime(int(s[:4]), int(s[4:6]), int(s[6:8]), tzinfo=TZ)
+            return ("allday", start, start + timedelta(days=1))
+        if (n == 15 or (n == 16 and s[15] == "Z")) and s[8] == "T" and s[:8].isdigit() and s[9:15].isdigit():
+            y, mo, d = int(s[:4]), int(s[4:6]), int(s[6:8])
+            h, mi, sec = int(s[9:11]), int(s[11:13]), int(s[13:15])
+            if n == 16:
+                return datetime(y, mo, d, h, mi, sec, tzinfo=timezone.utc).astimezone(TZ)
+            zone = _zone(tzid) if tzid else TZ
+            dt = datetime(y, mo, d, h, mi, sec, tzinfo=zone)
+            return dt if zone is TZ else dt.astimezone(TZ)
+    except ValueError:
+        pass
+    return None
+
+def _split_prop(ln: str):
+    """("DTSTART;TZID=…", "value") split at the first colon outside a quoted parameter."""
+    i = ln.find(":"); q = ln.find('"')
+    if q != -1 and q < i:
+        close = ln.find('"', q + 1)
+        if close != -1: i = ln.find(":", close)
+    return (ln[:i], ln[i + 1:]) if i != -1 else (ln, "")
+
+def _tzid(params: str):
+    for p in params.split(";")[1:]:
+        if p[:5].upper() == "TZID=": return p[5:]
+    return None
+
+def _unfold_ics_lines(lines):
+    """Yield logical lines from raw lines (str or bytes), joining folded continuations on the fly.
+
+    Byte lines are joined before decoding: producers fold at 75 octets, often in the middle
+    of a multi-byte UTF-8 character, so decoding each physical line on its own would mangle it.
+    """
+    buf = None; raw = False
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.rstrip(b"\r\n")
+            if not line: continue
+            if line[:1] in (b" ", b"\t") and buf is not None:
+                if len(buf) < MAX_LINE: buf += line[1:]
+                continue
+        else:
+            line = line.rstrip("\r\n")
+            if not line: continue
+            if line[0] in " \t" and buf is not None:
+                if len(buf) < MAX_LINE: buf += line[1:]
+                continue
+        if buf is not None: yield buf.decode("utf-8", "replace") if raw else buf
+        buf = line[:MAX_LINE]; raw = isinstance(line, bytes)
+    if buf is not None: yield buf.decode("utf-8", "replace") if raw else buf
+
+def _event_bounds(dtstart, dtend):
+    """(start, end) in Amsterdam time from (value, tzid) pairs; all-day and missing-DTEND defaults."""
+    stp = _parse_ics_dt(*dtstart); enp = _parse_ics_dt(*dtend) if dtend else None
+    if stp is None: return None, None
+    if isinstance(stp, tuple):
+        return stp[1], (enp[1] if isinstance(enp, tuple) else stp[2])
+    return stp, (enp if enp else stp + timedelta(hours=1))
+
+def _instant(parsed):
+    return parsed[1] if isinstance(parsed, tuple) else parsed
+
+def _expansion_zone(dtstart):
+    """Zone whose wall clock a series repeats in: UTC for Z stamps, TZID, else Amsterdam."""
+    val, tzid = dtstart
+    if val.strip().endswith("Z"): return timezone.utc
+    return _zone(tzid) if tzid else TZ
+
+def iter_ics_events(lines, window_start: datetime = None, window_end: datetime = None):
+    """Yield event dicts from an iterable of ICS lines, skipping events outside [window_start, window_end].
+
+    Only the current event's properties are held in memory, so a feed of any size is parsed
+    in bounded space; pass `response.iter_lines()` from a `stream=True` request to avoid
+    buffering the body. Recurring masters (RRULE) are kept until the feed ends, then expanded
+    lazily inside the window, minus EXDATEs and instances overridden by a RECURRENCE-ID
+    event. Without `window_end` a series yields only its first instance.
+    """
+    in_ev = False
+    masters = []; overridden = set()
+    for ln in _unfold_ics_lines(lines):
+        if ln.startswith("BEGIN:VEVENT"):
+            in_ev = True; dtstart = dtend = transp = busystatus = summary = uid = rrule = rid = status = None
+            exdates = []; continue
+        if ln.startswith("END:VEVENT"):
+            if in_ev and dtstart:
+                start, end = _event_bounds(dtstart, dtend)
+                if rid:
+                    orig = _instant(_parse_ics_dt(*rid))
+                    if orig: overridden.add((uid, orig))
+                if start and end and end > start and (status or "").strip().upper() != "CANCELLED":
+                    tr = (transp or "").upper().strip(); bs = (busystatus or "").upper().strip()
+                    busy = not (tr == "TRANSPARENT" or bs == "FREE")
+                    rule = parse_rrule(rrule, _parse_ics_dt) if (rrule and not rid and window_end) else None
+                    if rule:
+                        masters.append((uid, start.astimezone(_expansion_zone(dtstart)), end - start, rule,
+                                        frozenset(exdates), busy, (summary or "").strip()))
+                    elif not ((window_start and end < window_start) or (window_end and start > window_end)):
+                        yield {"start": start, "end": end, "busy": busy, "summary": (summary or "").strip()}
+            in_ev = False; continue
+        if not in_ev: continue
+        if ln.startswith("DTSTART"):
+            params, val = _split_prop(ln); dtstart = (val, _tzid(params))
+        elif ln.startswith("DTEND"):
+            params, val = _split_prop(ln); dtend = (val, _tzid(params))
+        elif ln.startswith("TRANSP"): transp = ln.split(":", 1)[-1]
+        elif "BUSYSTATUS" in ln: busystatus = ln.split(":", 1)[-1]
+        elif ln.startswith("SUMMARY"): summary = ln.split(":", 1)[-1]
+        elif ln.startswith("UID"): uid = ln.split(":", 1)[-1].strip()
+        elif ln.startswith("RRULE"): rrule = ln.split(":", 1)[-1]
+        elif ln.startswith("STATUS"): status = ln.split(":", 1)[-1]
+        elif ln.startswith("RECURRENCE-ID"):
+            params, val = _split_prop(ln); rid = (val, _tzid(params))
+        elif ln.startswith("EXDATE"):
+            params, val = _split_prop(ln); tzid = _tzid(params)
+            exdates += filter(None, (_instant(_parse_ics_dt(v, tzid)) for v in val.split(",")))
+
+    for uid, start, dur, rule, exdates, busy, summary in masters:
+        for occ in iter_occurrences(start, dur, rule, window_start or start, window_end, exdates):
+            occ_start = occ.astimezone(TZ)
+            if (uid, occ_start) in overridden: continue
+            yield {"start": occ_start, "end": (occ + dur).astimezone(TZ), "busy": busy, "summary": summary}
+
+def parse_ics(text: str):
+    return list(iter_ics_events(text.splitlines()))
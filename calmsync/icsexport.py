@@ -0,0 +1,172 @@
+"""ICS export: single breaks and whole week plans as streamed multi-VEVENT calendars.
+
+UIDs are derived from (user, plan day, slot), so re-exporting a plan whose breaks moved
+or changed activity updates the events in the user's calendar client instead of adding
+new ones, and two users never share a UID. A per-user export registry ({uid: [digest,
+sequence, dtstamp]}, persisted with the model) bumps SEQUENCE and DTSTAMP only when an
+event's content changes; VEVENT blocks are memoised on the full event tuple, so repeated
+exports of an unchanged plan are byte-identical and do no formatting work.
+
+    python -m calmsync.icsexport --users u1 u2 --out plans/           # one <user>.ics each
+    python -m calmsync.icsexport --users u1 --calendar https://…/work.ics --out -
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+PRODID = "-//StressAware//BreakScheduler//EN"
+UID_DOMAIN = "stress-aware"
+DESCRIPTION = "Suggested by Stress-Aware Scheduler."
+PLAN_DAYS = 7
+REGISTRY_KEEP_DAYS = 14   # registry entries for plan days older than this are dropped
+
+
+def _escape(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def _fold(line: str) -> str:
+    """RFC 5545 line folding at 75 octets (continuations start with a space)."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75: return line
+    parts = []; i = 0; width = 75
+    while i < len(raw):
+        j = min(i + width, len(raw))
+        while j < len(raw) and (raw[j] & 0xC0) == 0x80: j -= 1   # don't split a UTF-8 sequence
+        parts.append(raw[i:j].decode("utf-8")); i = j; width = 74
+    return "\r\n ".join(parts)
+
+def _utc(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+def event_uid(user_id: str, day: date, slot: str) -> str:
+    """Stable UID for the `slot` break of `user_id` on plan day `day` (not for its time or activity)."""
+    key = f"{user_id}|{day.isoformat()}|{slot}".encode("utf-8")
+    return f"{hashlib.sha1(key).hexdigest()[:24]}@{UID_DOMAIN}"
+
+def stamp_events(registry: dict, user_id: str, items, now: float = None) -> tuple:
+    """Export tuples (uid, activity, start, duration_min, sequence, dtstamp) for (slot, activity, start,
+    duration_min) items. `registry` ({uid: [digest, sequence, dtstamp_epoch]}) is updated in place:
+    an event whose content changed since its last export gets SEQUENCE + 1 and a new DTSTAMP."""
+    now = int(now if now is not None else time.time())
+    out = []
+    for slot, activity, start, duration_min in items:
+        uid = event_uid(user_id or "", start.date(), slot)
+        digest = f"{activity}|{_utc(start)}|{int(duration_min)}"
+        rec = registry.get(uid)
+        if rec is None: rec = registry[uid] = [digest, 0, now]
+        elif rec[0] != digest: rec = registry[uid] = [digest, rec[1] + 1, now]
+        out.append((uid, activity, start, int(duration_min), rec[1], datetime.fromtimestamp(rec[2], timezone.utc)))
+    return tuple(out)
+
+def prune_registry(registry: dict, today: date, keep_days: int = REGISTRY_KEEP_DAYS):
+    """Drop registry entries whose event started more than `keep_days` before `today`."""
+    cutoff = _utc(datetime(today.year, today.month, today.day, tzinfo=timezone.utc) - timedelta(days=keep_days))
+    for uid in [u for u, rec in registry.items() if rec[0].split("|")[-2] < cutoff]:
+        del registry[uid]
+
+@lru_cache(maxsize=4096)
+def vevent(uid: str, activity: str, start: datetime, duration_min: int, sequence: int, dtstamp: datetime,
+           description: str = DESCRIPTION) -> str:
+    """One CRLF-terminated VEVENT block; memoised on the full export tuple."""
+    end = start + timedelta(minutes=duration_min)
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"SEQUENCE:{sequence}",
+             f"DTSTAMP:{_utc(dtstamp)}", f"DTSTART:{_utc(start)}", f"DTEND:{_utc(end)}",
+             f"SUMMARY:{_escape(f'Break: {activity}')}", f"DESCRIPTION:{_escape(description)}",
+             "TRANSP:OPAQUE", "END:VEVENT"]
+    return "".join(_fold(ln) + "\r\n" for ln in lines)
+
+def iter_calendar(events, name: str = None):
+    """Yield the calendar as text chunks from stamp_events() tuples, one VEVENT at a time."""
+    head = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    if name: head.append(f"X-WR-CALNAME:{_escape(name)}")
+    yield "".join(_fold(ln) + "\r\n" for ln in head)
+    for ev in events:
+        yield vevent(*ev)
+    yield "END:VCALENDAR\r\n"
+
+def write_calendar(fp, events, name: str = None) -> int:
+    """Stream the calendar into binary file object `fp`; returns bytes written."""
+    n = 0
+    for chunk in iter_calendar(events, name):
+        b = chunk.encode("utf-8"); fp.write(b); n += len(b)
+    return n
+
+@lru_cache(maxsize=1024)
+def calendar_bytes(events: tuple, name: str = None) -> bytes:
+    """Whole calendar for a (hashable) tuple of events; memoised for download buttons."""
+    return "".join(iter_calendar(events, name)).encode("utf-8")
+
+
+# ── week plans ───────────────────────────────────────────────────────────────
+def week_plan(state, days: int = PLAN_DAYS, duration_min: int = None, nowr: datetime = None):
+    """One recommended break per day for `days` days: (("plan", activity, start, duration_min), …).
+
+    Deterministic for a given model and calendar (favourites by learned value, rotated over
+    the days, each on its best-ranked slot of the day), so the UIDs stay stable across reruns.
+    """
+    from calmsync import engine
+    nowr = nowr or engine.now_local(state)
+    anchor = nowr.replace(minute=0, second=0, microsecond=0)  # rank from the hour: no churn within it
+    duration_min = duration_min or state.get("accept_duration") or 15
+    table = state["model"]["overall"]
+    favs = sorted(state.get("favorite_activities") or state["all_activities"],
+                  key=lambda a: (-table.get(a, {"value": 0})["value"], a))
+    if not favs: return ()
+    ranked = {}
+    plan = []
+    for d in range(days):
+        day = (nowr + timedelta(days=d)).date(); act = favs[d % len(favs)]
+        if act not in ranked:
+            ranked[act] = engine.rank_slots(state, act, duration_min, days=days, k=days * 64, nowr=anchor)
+        best = next((s for s, _, _ in ranked[act] if s.date() == day and s >= nowr), None)
+        if best is not None: plan.append(("plan", act, best, duration_min))
+    return tuple(plan)
+
+def plan_events(state, days: int = PLAN_DAYS, duration_min: int = None, nowr: datetime = None) -> tuple:
+    """week_plan() stamped against the user's export registry (state["ics_exports"])."""
+    registry = state["ics_exports"]
+    events = stamp_events(registry, state.get("user_id"), week_plan(state, days, duration_min, nowr))
+    prune_registry(registry, (nowr or datetime.now(timezone.utc)).date())
+    return events
+
+def export_users(user_ids, out_dir: str, calendar_urls=(), days: int = PLAN_DAYS, duration_min: int = 15):
+    """Write <out_dir>/<user>.ics week plans for users in the model store ('-' = stdout); returns {user: path}."""
+    from calmsync import engine
+    from calmsync.store import model_store
+    written = {}
+    for uid in user_ids:
+        state = engine.init_state({"user_id": uid})
+        saved = model_store.load(uid)
+        if saved: engine.restore_user(state, saved)
+        if calendar_urls: engine.refresh_calendar(state, list(calendar_urls))
+        plan = plan_events(state, days, duration_min)
+        model_store.save(uid, engine.user_snapshot(state))   # keep SEQUENCE numbers for the next export
+        if out_dir == "-":
+            write_calendar(sys.stdout.buffer, plan, f"Breaks for {uid}"); written[uid] = "-"; continue
+        path = os.path.join(out_dir, f"{uid}.ics")
+        with open(path, "wb") as f: write_calendar(f, plan, f"Breaks for {uid}")
+        written[uid] = path
+    return written
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", nargs="+", required=True)
+    ap.add_argument("--out", default="-", help="directory for <user>.ics files, or - for stdout")
+    ap.add_argument("--calendar", nargs="*", default=(), help="busy feeds to plan around")
+    ap.add_argument("--days", type=int, default=PLAN_DAYS)
+    ap.add_argument("--duration", type=int, default=15, help="break length in minutes")
+    args = ap.parse_args(argv)
+    if args.out != "-": os.makedirs(args.out, exist_ok=True)
+    written = export_users(args.users, args.out, args.calendar, args.days, args.duration)
+    if args.out != "-":
+        for uid, path in written.items(): print(f"{uid}\t{path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+# Hot-path instrumentation: timing spans, counters, per-rerun breakdowns.
+#   • span("name") / @timed("name") feed a process-wide latency histogram per span
+#   • incr("name", n) bumps a counter (cache hits, bytes downloaded, events parsed, …)
+#   • start_rerun()/end_rerun() bracket one Streamlit script run (@fragment_rerun does the same
+#     for a fragment's own reruns, which skip the script body); runs slower than
+#     SLOW_RERUN_S are written to the JSONL log with their span breakdown and, when
+#     enabled, a sampled stack profile
+# Exposed as Prometheus text on CALMSYNC_METRICS_PORT and/or JSONL at CALMSYNC_METRICS_LOG.
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_RERUN_S = float(os.environ.get("CALMSYNC_SLOW_RERUN_S", "0.5"))
+LOG_PATH = os.environ.get("CALMSYNC_METRICS_LOG")
+PROFILE_SLOW = os.environ.get("CALMSYNC_PROFILE_SLOW", "") not in ("", "0")
+SAMPLE_INTERVAL_S = 0.005
+
+_lock = threading.Lock()
+_counters = Counter()
+_hists = {}                       # span -> [bucket counts…, +Inf count, sum]
+_current = contextvars.ContextVar("calmsync_rerun", default=None)
+_slow_hooks = []
+
+
+def incr(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+def observe(name: str, seconds: float):
+    with _lock:
+        h = _hists.get(name)
+        if h is None: h = _hists[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b: h[i] += 1
+        h[len(BUCKETS)] += 1; h[-1] += seconds
+    run = _current.get()
+    if run is not None: run["spans"].append((name, round(seconds * 1000, 3)))
+
+@contextmanager
+def span(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+def timed(name: str):
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def count_bytes(lines, name: str = "calendar_bytes_downloaded"):
+    """Pass-through over response lines that counts their size once the stream is consumed."""
+    total = 0
+    try:
+        for ln in lines:
+            total += len(ln) + 1
+            yield ln
+    finally:
+        incr(name, total)
+
+
+# ── per-rerun tracking ───────────────────────────────────────────────────────
+class _Sampler(threading.Thread):
+    """Samples one thread's stack every SAMPLE_INTERVAL_S until stopped."""
+
+    def __init__(self, ident):
+        super().__init__(name="rerun-sampler", daemon=True)
+        self.target = ident; self.stacks = Counter(); self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(SAMPLE_INTERVAL_S):
+            frame = sys._current_frames().get(self.target); stack = []
+            while frame is not None and len(stack) < 12:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack: self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._halt.set(); self.join(timeout=1)
+        return self.stacks.most_common(15)
+
+def on_slow_rerun(hook):
+    """Register hook(record) called with each slow rerun's record (spans, profile, …)."""
+    _slow_hooks.append(hook)
+
+def start_rerun(page: str = None, fragment: bool = False):
+    run = {"page": page, "fragment": fragment, "t0": time.perf_counter(), "spans": [],
+           "sampler": _Sampler(threading.get_ident()) if PROFILE_SLOW else None}
+    if run["sampler"]: run["sampler"].start()
+    _current.set(run)
+    return run
+
+def end_rerun(run):
+    if run is None: return
+    _current.set(None)
+    elapsed = time.perf_counter() - run["t0"]
+    observe("rerun", elapsed)
+    incr("reruns")
+    if run["fragment"]: observe("rerun.fragment", elapsed); incr("fragment_reruns")
+    profile = run["sampler"].stop() if run["sampler"] else None
+    if elapsed < SLOW_RERUN_S: return
+    incr("slow_reruns")
+    rec = {"ts": time.time(), "event": "slow_rerun", "page": run["page"], "ms": round(elapsed * 1000, 3),
+           "spans": run["spans"]}
+    if run["fragment"]: rec["fragment"] = True
+    if profile: rec["profile"] = profile
+    write_log(rec)
+    for hook in _slow_hooks:
+        try: hook(rec)
+        except Exception: pass
+
+def fragment_rerun(page: str):
+    """Decorator for an @st.fragment body: when it runs on its own (no script run in progress)
+    it is recorded as a rerun of `page`; inside a full run its spans land in that run."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is not None: return fn(*args, **kwargs)
+            run = start_rerun(page, fragment=True)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                end_rerun(run)
+        return wrapper
+    return deco
+
+
+# ── exposition ───────────────────────────────────────────────────────────────
+def snapshot():
+    with _lock:
+        return dict(_counters), {k: list(v) for k, v in _hists.items()}
+
+def render_prometheus() -> str:
+    counters, hists = snapshot()
+    out = []
+    for name, v in sorted(counters.items()):
+        out += [f"# TYPE calmsync_{name}_total counter", f"calmsync_{name}_total {v:g}"]
+    out.append("# TYPE calmsync_span_seconds histogram")
+    for name, h in sorted(hists.items()):
+        for b, c in zip(BUCKETS, h):
+            out.append(f'calmsync_span_seconds_bucket{{span="{name}",le="{b:g}"}} {c}')
+        out += [f'calmsync_span_seconds_bucket{{span="{name}",le="+Inf"}} {h[len(BUCKETS)]}',
+                f'calmsync_span_seconds_sum{{span="{name}"}} {h[-1]:.6f}',
+                f'calmsync_span_seconds_count{{span="{name}"}} {h[len(BUCKETS)]}']
+    return "\n".join(out) + "\n"
+
+def write_log(rec: dict, path: str = None):
+    path = path or LOG_PATH
+    if not path: return
+    line = json.dumps(rec, separators=(",", ":")) + "\n"
+    with _lock:
+        with open(path, "a", encoding="utf-8") as f: f.write(line)
+
+_server = None
+
+def serve(port: int, host: str = "127.0.0.1"):
+    """Serve /metrics (Prometheus text) on a daemon thread; idempotent."""
+    global _server
+    if _server is not None: return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode()
+            self.send_response(200 if self.path.split("?")[0] in ("/", "/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4"); self.send_header("Content-Length", str(len(body)))
+            self.end_headers(); self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
+
+if os.environ.get("CALMSYNC_METRICS_PORT"):
+    try: serve(int(os.environ["CALMSYNC_METRICS_PORT"]))
+    except OSError: pass   # another worker in this host already serves it
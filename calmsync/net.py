@@ -0,0 +1,63 @@
+# Shared network plumbing: one pooled HTTP session and an I/O pool for loading
+# independent sources concurrently under per-source timeouts. `requests` is imported
+# on the first HTTP call, so importing the engine stays cheap.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+IO_WORKERS = 64   # upper bound; the pool only starts a thread when no idle one can take a source
+
+_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="calmsync-io")
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> "requests.Session":
+    """Process-wide keep-alive session; connections are reused across sessions and reruns."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=16, pool_maxsize=IO_WORKERS)
+                s.mount("https://", adapter); s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def gather(sources: dict, deadline_s: float = None):
+    """Run {name: (fn, timeout_s)} concurrently; return ({name: result}, {name: error}).
+
+    Every source starts at once, so the wall time is the slowest source (capped by
+    `deadline_s`), not the sum. A source's timeout counts from when a worker picks it
+    up, so time spent queued behind other sessions' work isn't charged to it; the
+    deadline counts from the call. Sources that miss either are reported as errors and,
+    if still queued, cancelled; running ones finish in the background under their own
+    HTTP timeouts and their callers keep whatever they had before.
+    Callables run off the script thread and must not touch st.session_state.
+    """
+    end = float("inf") if deadline_s is None else time.monotonic() + deadline_s
+    started = {name: [threading.Event(), None] for name in sources}
+    futs = {name: _pool.submit(_run, fn, started[name]) for name, (fn, _) in sources.items()}
+    results, errors = {}, {}
+    for name, (_, timeout) in sources.items():
+        ev, fut = started[name][0], futs[name]
+        missed = f"missed the {deadline_s:g}s deadline" if deadline_s is not None else ""
+        try:
+            if not ev.wait(None if deadline_s is None else max(0.0, end - time.monotonic())):
+                raise FutureTimeout
+            due = started[name][1] + timeout
+            if due < end: missed = f"timed out after {timeout:g}s"
+            results[name] = fut.result(timeout=max(0.0, min(due, end) - time.monotonic()))
+        except FutureTimeout:
+            fut.cancel(); errors[name] = missed
+        except Exception as ex:
+            errors[name] = str(ex) or type(ex).__name__
+    return results, errors
+
+
+def _run(fn, started):
+    started[1] = time.monotonic(); started[0].set()
+    return fn()
@@ -0,0 +1,84 @@
+# Horizon-wide slot ranking: every candidate start on the step grid across the next N
+# days is scored in one vectorised pass over the busy index, the hourly forecast and
+# the current stress score, and the top-k are returned.
+#   • fit     — the break must fit in a free gap; roomier gaps score higher (no squeezing
+#               a walk between back-to-back meetings)
+#   • weather — outdoor activities are pushed away from rain and strong wind
+#   • urgency — the lower the stress-management score, the more a sooner slot wins
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DAY_START_H, DAY_END_H = 8, 22
+OUTDOOR_WORDS = ("outside", "walk", "run", "bike", "cycle", "garden")
+W_GAP, W_SOON, W_RAIN, W_WIND = 1.0, 1.5, 2.0, 1.0
+RAIN_MM_FULL = 1.0       # ≥ 1 mm/h counts as fully rainy
+WIND_OK, WIND_SPAN = 8.0, 8.0  # m/s: no penalty below WIND_OK, full penalty at WIND_OK + WIND_SPAN
+SOON_HALF_LIFE_H = 12.0
+
+
+def is_outdoor(activity: str) -> bool:
+    a = (activity or "").lower()
+    return any(w in a for w in OUTDOOR_WORDS)
+
+def candidate_grid(first_day, days: int, step_s: int, tz):
+    """(starts, day_ends): epoch starts on the step grid within DAY_START_H…DAY_END_H for
+    `days` days, and the DAY_END_H boundary of each start's day."""
+    starts, ends = [], []
+    for k in range(days):
+        d = first_day + timedelta(days=k)
+        lo = int(datetime(d.year, d.month, d.day, DAY_START_H, tzinfo=tz).timestamp())
+        hi = int(datetime(d.year, d.month, d.day, DAY_END_H, tzinfo=tz).timestamp())
+        starts.append(np.arange(lo, hi, step_s, dtype=np.int64)); ends.append(np.full(starts[-1].size, hi, np.int64))
+    if not starts: return np.empty(0, np.int64), np.empty(0, np.int64)
+    return np.concatenate(starts), np.concatenate(ends)
+
+def free_gaps(busy_starts: np.ndarray, busy_ends: np.ndarray, t: np.ndarray):
+    """(gap_start, gap_end) of the free gap containing each start (gap_end == t where t is busy).
+
+    `busy_*` are the merged, disjoint blocks of a BusyIndex, so both are sorted.
+    """
+    i = np.searchsorted(busy_ends, t, side="right")           # first block ending after t
+    nxt = np.append(busy_starts, np.iinfo(np.int64).max)[i]   # … it starts here (maybe ≤ t: busy)
+    prev = np.append(np.iinfo(np.int64).min, busy_ends)[i]    # previous block's end
+    return prev, np.maximum(nxt, t)
+
+def rank(busy_starts, busy_ends, now: datetime, duration_s: int, *, days: int = 3, step_s: int = 1800,
+         precip=None, wind=None, hour0: int = 0, sma=None, threshold: float = 50.0, outdoor: bool = False,
+         k: int = 5):
+    """Top-k (epoch_start, score, parts) for a break of `duration_s` from `now` over `days` days.
+
+    `precip`/`wind` are hourly arrays whose element 0 is the hour starting at epoch `hour0`;
+    hours past their end use the last value. `parts` breaks the score down per component.
+    """
+    t, day_end = candidate_grid(now.date(), days, step_s, now.tzinfo)
+    keep = t >= np.ceil(now.timestamp())
+    t, day_end = t[keep], day_end[keep]
+    if not t.size: return []
+    bs = np.asarray(busy_starts, np.int64); be = np.asarray(busy_ends, np.int64)
+    g0, g1 = free_gaps(bs, be, t)
+    fits = (g1 - t >= duration_s) & (t + duration_s <= day_end)
+    t, g0, g1 = t[fits], g0[fits], g1[fits]
+    if not t.size: return []
+
+    room = (np.minimum(g1, t + 4 * duration_s) - np.maximum(g0, t - duration_s)) / (5.0 * duration_s)
+    gap = W_GAP * np.clip(room, 0.0, 1.0)
+    urgency = 0.0 if sma is None else max(0.0, (threshold - sma) / threshold)
+    soon = W_SOON * (0.25 + urgency) * np.exp2(-(t - now.timestamp()) / 3600.0 / SOON_HALF_LIFE_H)
+    rain = wind_pen = np.zeros(t.size)
+    if outdoor and precip is not None and len(precip):
+        h = np.clip((t - hour0) // 3600, 0, len(precip) - 1)
+        h_end = np.clip((t + duration_s - 1 - hour0) // 3600, 0, len(precip) - 1)
+        p = np.maximum(np.asarray(precip, float)[h], np.asarray(precip, float)[h_end])
+        rain = W_RAIN * np.clip(p / RAIN_MM_FULL, 0.0, 1.0)
+        if wind is not None and len(wind):
+            w = np.maximum(np.asarray(wind, float)[h], np.asarray(wind, float)[h_end])
+            wind_pen = W_WIND * np.clip((w - WIND_OK) / WIND_SPAN, 0.0, 1.0)
+    score = gap + soon - rain - wind_pen
+
+    k = min(k, score.size)
+    top = np.argpartition(-score, k - 1)[:k]
+    top = top[np.lexsort((t[top], -score[top]))]              # best first, earlier on ties
+    return [(int(t[i]), round(float(score[i]), 3),
+             {"gap": round(float(gap[i]), 3), "soon": round(float(soon[i]), 3),
+              "rain": round(float(rain[i]), 3), "wind": round(float(wind_pen[i]), 3)}) for i in top]
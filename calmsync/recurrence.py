@@ -0,0 +1,139 @@
+# RRULE expansion (RFC 5545 subset) as a lazy generator bounded by the scheduling window.
+#   FREQ=DAILY|WEEKLY|MONTHLY|YEARLY with INTERVAL, COUNT, UNTIL, BYDAY (incl. 1MO / -1FR),
+#   BYMONTHDAY, BYMONTH and BYSETPOS. Any other rule part (BYWEEKNO, BYYEARDAY, BYHOUR, …)
+#   makes the rule unsupported, so the series falls back to its first instance instead of
+#   expanding into false busy blocks. Open-ended and UNTIL series jump straight to the
+#   window, so the cost follows the occurrences inside it; COUNT series are walked from
+#   DTSTART (≤ COUNT).
+import calendar
+from datetime import date, datetime, timedelta
+
+FREQS = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+PARTS = frozenset(("FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "BYMONTHDAY", "BYMONTH", "BYSETPOS", "WKST"))
+
+
+class RRule:
+    __slots__ = ("freq", "interval", "count", "until", "byday", "bymonthday", "bymonth", "bysetpos")
+
+    def __init__(self, freq, interval=1, count=None, until=None, byday=(), bymonthday=(), bymonth=(), bysetpos=()):
+        self.freq = freq; self.interval = max(1, interval); self.count = count; self.until = until
+        self.byday = byday; self.bymonthday = bymonthday; self.bymonth = bymonth; self.bysetpos = bysetpos
+
+
+def parse_rrule(value: str, parse_dt):
+    """RRule from an RRULE value, or None if unsupported. `parse_dt` decodes UNTIL."""
+    parts = {}
+    for p in filter(None, value.strip().split(";")):   # tolerate a trailing ';'
+        k, _, v = p.partition("=")
+        parts[k.strip().upper()] = v.strip()
+    freq = parts.get("FREQ", "").upper()
+    if freq not in FREQS or not PARTS.issuperset(parts): return None
+    try:
+        byday = []
+        for tok in filter(None, parts.get("BYDAY", "").upper().split(",")):
+            wd = WEEKDAYS.get(tok[-2:])
+            if wd is None: return None
+            byday.append((int(tok[:-2]) if tok[:-2] else 0, wd))
+        interval = int(parts.get("INTERVAL", 1))
+        # WKST only moves week boundaries for multi-week WEEKLY rules; only the default (MO) is handled
+        if parts.get("WKST", "MO").upper() != "MO" and freq == "WEEKLY" and interval > 1 and byday: return None
+        bymonth = tuple(int(m) for m in parts["BYMONTH"].split(",")) if "BYMONTH" in parts else ()
+        # ordinal BYDAY in a YEARLY rule without BYMONTH counts weeks of the year (20MO): not handled;
+        # RFC 5545 doesn't allow it in DAILY/WEEKLY rules, nor BYMONTHDAY in WEEKLY ones
+        if any(n for n, _ in byday) and (freq in ("DAILY", "WEEKLY") or freq == "YEARLY" and not bymonth): return None
+        if freq == "WEEKLY" and "BYMONTHDAY" in parts: return None
+        bysetpos = tuple(int(x) for x in parts["BYSETPOS"].split(",")) if "BYSETPOS" in parts else ()
+        if any(x == 0 for x in bysetpos): return None
+        until = None
+        if "UNTIL" in parts:
+            until = parse_dt(parts["UNTIL"])
+            if isinstance(until, tuple): until = until[2] - timedelta(microseconds=1)  # DATE: whole day
+            if until is None: return None
+        return RRule(freq, interval, int(parts["COUNT"]) if "COUNT" in parts else None, until,
+                     tuple(byday), tuple(int(d) for d in parts["BYMONTHDAY"].split(",")) if "BYMONTHDAY" in parts else (),
+                     bymonth, bysetpos)
+    except ValueError:
+        return None
+
+
+def _month_add(y, m, k):
+    m0 = m - 1 + k
+    return y + m0 // 12, m0 % 12 + 1
+
+def _month_days(y, m, rule, start_day, byday=True):
+    last = calendar.monthrange(y, m)[1]
+    days = set()
+    if rule.byday and byday:
+        for n, wd in rule.byday:
+            first = (wd - date(y, m, 1).weekday()) % 7 + 1
+            hits = list(range(first, last + 1, 7))
+            if n == 0: days.update(hits)
+            elif -len(hits) <= n <= len(hits) and n != 0: days.add(hits[n - 1] if n > 0 else hits[n])
+        if rule.bymonthday:
+            days &= {d if d > 0 else last + 1 + d for d in rule.bymonthday}
+    elif rule.bymonthday:
+        days = {d if d > 0 else last + 1 + d for d in rule.bymonthday if 1 <= (d if d > 0 else last + 1 + d) <= last}
+    elif start_day <= last:
+        days = {start_day}
+    return sorted(days)
+
+def _period(rule, start: datetime, p: int):
+    """(first date of period p, candidate dates in it, sorted), BYSETPOS applied."""
+    anchor, days = _candidates(rule, start, p)
+    if rule.bysetpos and days:
+        days = sorted({days[i - 1 if i > 0 else i] for i in rule.bysetpos if -len(days) <= i <= len(days)})
+    return anchor, days
+
+def _candidates(rule, start: datetime, p: int):
+    d0 = start.date()
+    if rule.freq == "DAILY":
+        d = d0 + timedelta(days=p * rule.interval)
+        ok = (not rule.byday or d.weekday() in {wd for _, wd in rule.byday}) and (not rule.bymonth or d.month in rule.bymonth) \
+            and (not rule.bymonthday or d.day in _month_days(d.year, d.month, rule, 0, byday=False))
+        return d, [d] if ok else []
+    if rule.freq == "WEEKLY":
+        ws = d0 - timedelta(days=d0.weekday()) + timedelta(weeks=p * rule.interval)
+        wds = sorted({wd for _, wd in rule.byday}) if rule.byday else [d0.weekday()]
+        return ws, [d for d in (ws + timedelta(days=wd) for wd in wds) if not rule.bymonth or d.month in rule.bymonth]
+    if rule.freq == "MONTHLY":
+        y, m = _month_add(d0.year, d0.month, p * rule.interval)
+        if rule.bymonth and m not in rule.bymonth: return date(y, m, 1), []
+        return date(y, m, 1), [date(y, m, d) for d in _month_days(y, m, rule, d0.day)]
+    y = d0.year + p * rule.interval
+    months = rule.bymonth or (range(1, 13) if rule.byday or rule.bymonthday else (d0.month,))
+    out = []
+    for m in months:
+        out += [date(y, m, d) for d in _month_days(y, m, rule, d0.day)]
+    return date(y, 1, 1), sorted(out)   # BYMONTH may list months in any order
+
+def _first_period(rule, start: datetime, not_before: datetime):
+    """A period index whose occurrences can't end at/after `not_before` before it (conservative)."""
+    if rule.count is not None or not_before <= start: return 0
+    gap = not_before.date() - start.date()
+    if rule.freq == "DAILY": span = gap.days // rule.interval
+    elif rule.freq == "WEEKLY": span = gap.days // 7 // rule.interval
+    elif rule.freq == "MONTHLY": span = ((not_before.year - start.year) * 12 + not_before.month - start.month) // rule.interval
+    else: span = (not_before.year - start.year) // rule.interval
+    return max(0, span - 1)
+
+
+def iter_occurrences(start: datetime, duration: timedelta, rule: RRule, window_start: datetime, window_end: datetime,
+                     exdates=frozenset()):
+    """Yield occurrence starts (in `start`'s zone, wall-clock preserved) overlapping [window_start, window_end]."""
+    p = _first_period(rule, start, window_start - duration)
+    n = 0
+    stop = window_end if rule.until is None else min(window_end, rule.until)
+    while True:
+        anchor, days = _period(rule, start, p)
+        if datetime(anchor.year, anchor.month, anchor.day, tzinfo=start.tzinfo) > stop: return
+        for d in days:
+            occ = start.replace(year=d.year, month=d.month, day=d.day)
+            if occ < start: continue
+            if rule.count is not None:
+                n += 1
+                if n > rule.count: return
+            if occ > stop: return
+            if occ in exdates or occ + duration < window_start: continue
+            yield occ
+        p += 1
@@ -0,0 +1,231 @@
+# Wearable stress-signal ingestion: 1 Hz heart-rate / HRV samples are streamed into a
+# fixed-size ring buffer that keeps the rolling stress-management score (SMA) in O(1)
+# per sample, plus one compact aggregate per local day.
+#   • sources: a CSV / JSONL file read line by line, or mock_device() standing in for a
+#     wearable API; either is a plain iterator of (epoch_s, hr_bpm, hrv_ms)
+#   • SOURCE is resolved per user: "mock" seeds the simulator from the user id, and a file
+#     source is a path template ("samples/{user_id}.csv") or a directory of <user_id>.csv /
+#     .jsonl files, so users never share (or replay) one another's wearable data
+#   • signal_hub keeps one SignalStream per user, fed on a daemon thread, so a rerun
+#     reads the latest score as an attribute lookup instead of rescanning history; streams
+#     idle for IDLE_S (or beyond MAX_STREAMS) are stopped and dropped
+#   • closed (and periodically the open) days are handed to an on_aggregate callback,
+#     e.g. ModelStore.save_daily, for persistence
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from array import array
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("Europe/Amsterdam")
+WINDOW_S = 15 * 60          # rolling SMA over the last 15 minutes of samples
+PERSIST_EVERY = 300         # also hand the open day's aggregate over every N samples
+SOURCE = os.environ.get("CALMSYNC_SIGNAL_SOURCE", "")  # "mock", a "{user_id}" path template, or a directory
+IDLE_S = 30 * 60            # streams nobody read for this long are stopped
+MAX_STREAMS = 1000          # … and the least recently read beyond this many
+
+REF_HR, REF_HRV = 70.0, 40.0  # a sample at 70 bpm / 40 ms RMSSD scores 50
+
+
+def sample_score(hr: float, hrv: float) -> float:
+    """0…100 stress-management score for one sample: higher HRV and lower HR score better."""
+    s = 50.0 + (hrv - REF_HRV) - (hr - REF_HR)
+    return 0.0 if s < 0.0 else 100.0 if s > 100.0 else s
+
+
+class RingBuffer:
+    """Fixed-capacity float ring; push() returns the value it overwrote (or None)."""
+    __slots__ = ("buf", "head", "size")
+
+    def __init__(self, capacity: int):
+        self.buf = array("d", bytes(8 * capacity)); self.head = 0; self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, x: float):
+        buf, h = self.buf, self.head
+        old = buf[h] if self.size == len(buf) else None
+        buf[h] = x
+        self.head = h + 1 if h + 1 < len(buf) else 0
+        if old is None: self.size += 1
+        return old
+
+
+class DailyAggregate:
+    __slots__ = ("day", "n", "total", "lo", "hi", "last")
+
+    def __init__(self, day: str):
+        self.day = day; self.n = 0; self.total = 0.0; self.lo = math.inf; self.hi = -math.inf; self.last = None
+
+    def add(self, score: float, sma: float):
+        self.n += 1; self.total += score; self.last = sma
+        if score < self.lo: self.lo = score
+        if score > self.hi: self.hi = score
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+    def as_dict(self) -> dict:
+        return {"day": self.day, "n": self.n, "mean": round(self.mean, 2), "min": round(self.lo, 2),
+                "max": round(self.hi, 2), "last": round(self.last, 2)}
+
+
+class SignalStream:
+    """Rolling SMA over the last `window` samples plus today's aggregate; ingest() is O(1)."""
+
+    def __init__(self, window: int = WINDOW_S, on_aggregate=None, persist_every: int = PERSIST_EVERY):
+        self.ring = RingBuffer(window); self.total = 0.0; self._pushes = 0
+        self.on_aggregate = on_aggregate; self.persist_every = persist_every
+        self.today = None; self.last_ts = None; self.sma = None
+        self.seen = time.monotonic(); self.stopped = False
+
+    def ingest(self, ts: float, hr: float, hrv: float):
+        if self.last_ts is not None and ts <= self.last_ts: return   # duplicate / out of order
+        day = datetime.fromtimestamp(ts, TZ).date().isoformat()
+        if self.today is None or day != self.today.day:
+            if self.today is not None: self._emit()
+            self.today = DailyAggregate(day)
+        score = sample_score(hr, hrv)
+        old = self.ring.push(score)
+        self.total += score - (old or 0.0)
+        self._pushes += 1
+        if self._pushes >= len(self.ring.buf):   # refresh the running sum once per lap: no float drift
+            self.total = math.fsum(self.ring.buf[:self.ring.size]); self._pushes = 0
+        self.sma = self.total / self.ring.size
+        self.last_ts = ts
+        self.today.add(score, self.sma)
+        if self.persist_every and self.today.n % self.persist_every == 0: self._emit()
+
+    def extend(self, samples):
+        for ts, hr, hrv in samples: self.ingest(ts, hr, hrv)
+        return self
+
+    def latest(self):
+        """(epoch_s, rolling score) of the newest sample, or None before the first one."""
+        return (self.last_ts, self.sma) if self.sma is not None else None
+
+    def flush(self):
+        if self.today is not None and self.today.n: self._emit()
+
+    def _emit(self):
+        if self.on_aggregate is not None: self.on_aggregate(self.today.as_dict())
+
+
+# ── sources ──────────────────────────────────────────────────────────────────
+def _epoch(v) -> float:
+    if isinstance(v, (int, float)): return float(v)
+    v = v.strip()
+    try:
+        return float(v)
+    except ValueError:
+        dt = datetime.fromisoformat(v)
+        return (dt if dt.tzinfo else dt.replace(tzinfo=TZ)).timestamp()
+
+def read_samples(path: str):
+    """Stream (epoch_s, hr, hrv) from `ts,hr,hrv` CSV (header optional) or JSONL {"ts","hr","hrv"}."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] == "#": continue
+            try:
+                if line[0] == "{":
+                    d = json.loads(line); yield _epoch(d["ts"]), float(d["hr"]), float(d["hrv"])
+                else:
+                    ts, hr, hrv = line.split(",")[:3]; yield _epoch(ts), float(hr), float(hrv)
+            except (ValueError, KeyError):
+                continue   # header row or a corrupt sample
+
+def mock_device(start: float = None, seed: int = None, backfill_s: int = WINDOW_S):
+    """Endless 1 Hz stream with slow stress episodes; starts `backfill_s` in the past."""
+    rng = random.Random(seed)
+    t = float(int(start if start is not None else time.time() - backfill_s))
+    load = 0.0
+    while True:
+        load += rng.gauss(0, 0.02) - 0.002 * load           # mean-reverting stress level
+        hr = 68 + 25 * load + rng.gauss(0, 2); hrv = 45 - 25 * load + rng.gauss(0, 4)
+        yield t, hr, max(hrv, 5.0)
+        t += 1.0
+
+def source_path(spec: str, user_id: str):
+    """The user's sample file for a file SOURCE spec, or None if there is none.
+
+    A spec without "{user_id}" that is not a directory names one file for everybody and is
+    not served (every user would replay the same wearable).
+    """
+    if "{user_id}" in spec: path = spec.replace("{user_id}", user_id)
+    elif os.path.isdir(spec):
+        path = next((p for p in (os.path.join(spec, user_id + ext) for ext in (".csv", ".jsonl")) if os.path.isfile(p)),
+                    None)
+    else: return None
+    return path if path and os.path.isfile(path) else None
+
+def open_source(spec: str, user_id: str):
+    """(samples, realtime) of `user_id` for a SOURCE spec, or None: the mock ticks in real time,
+    files replay at once."""
+    if spec == "mock":
+        return mock_device(seed=int(hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:8], 16)), True
+    path = source_path(spec, user_id)
+    return (read_samples(path), False) if path else None
+
+
+class SignalHub:
+    """One SignalStream per user, fed from a source on a daemon thread; idle streams are stopped."""
+
+    def __init__(self, idle_s: float = IDLE_S, max_streams: int = MAX_STREAMS):
+        self._streams = {}; self._lock = threading.Lock()
+        self.idle_s = idle_s; self.max_streams = max_streams
+
+    def __len__(self):
+        return len(self._streams)
+
+    def get(self, user_id: str):
+        stream = self._streams.get(user_id)
+        if stream is not None: stream.seen = time.monotonic()
+        return stream
+
+    def attach(self, user_id: str, samples, on_aggregate=None, realtime: bool = True) -> SignalStream:
+        """Start ingesting `samples` for `user_id` (idempotent); realtime waits for each sample's timestamp."""
+        with self._lock:
+            stream = self._streams.get(user_id)
+            if stream is not None: stream.seen = time.monotonic(); return stream
+            self._evict(time.monotonic())
+            stream = self._streams[user_id] = SignalStream(on_aggregate=on_aggregate)
+        threading.Thread(target=self._feed, args=(stream, samples, realtime), name=f"signal-{user_id[:8]}",
+                         daemon=True).start()
+        return stream
+
+    def stop(self, user_id: str):
+        with self._lock:
+            stream = self._streams.pop(user_id, None)
+        if stream is not None: stream.stopped = True
+
+    def _evict(self, now: float):
+        """Stop streams idle for idle_s, then the least recently read ones beyond max_streams - 1 (lock held)."""
+        streams = self._streams
+        for uid in [u for u, s in streams.items() if now - s.seen > self.idle_s]:
+            streams.pop(uid).stopped = True
+        if len(streams) >= self.max_streams:
+            for uid in sorted(streams, key=lambda u: streams[u].seen)[:len(streams) - self.max_streams + 1]:
+                streams.pop(uid).stopped = True
+
+    @staticmethod
+    def _feed(stream, samples, realtime):
+        try:
+            for ts, hr, hrv in samples:
+                if stream.stopped: break
+                if realtime:
+                    wait = ts - time.time()
+                    if wait > 0: time.sleep(wait)
+                stream.ingest(ts, hr, hrv)
+        finally:
+            stream.flush()
+
+
+signal_hub = SignalHub()
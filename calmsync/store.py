@@ -0,0 +1,216 @@
+# Persistent per-user model store: SQLite in WAL mode behind a write-behind queue.
+#   • load() is a point read, done once per session; queued and in-flight writes are
+#     applied over the stored row, so a read never misses a write that hasn't committed yet
+#   • save() queues the user's profile fields (favourites, activities, export registry);
+#     add_reward() queues one bandit reward as a per-(activity, context) count + sum. Neither
+#     touches disk: a single writer thread flushes batches in one transaction, adding the
+#     queued increments to the stored stats, so feedback never waits on disk or on other
+#     sessions, and two tabs of one user each add what they learned instead of overwriting
+#   • save_daily() does the same for per-day stress-signal aggregates (calmsync.signals)
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.environ.get("CALMSYNC_DB",
+                         os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "calmsync.db"))
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS user_model(
+    user_id TEXT PRIMARY KEY, payload TEXT NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS daily_signal(
+    user_id TEXT NOT NULL, day TEXT NOT NULL, n INTEGER NOT NULL, mean REAL, min REAL, max REAL, last REAL,
+    PRIMARY KEY(user_id, day)) WITHOUT ROWID"""
+
+
+class ModelStore:
+    def __init__(self, path=DB_PATH, flush_s=1.0, batch=256):
+        self.path = path; self.flush_s = flush_s; self.batch = batch
+        self._pending = {}                       # user_id -> json profile fields (merged, see _apply_fields)
+        self._pending_rewards = {}               # (user_id, activity, context) -> [count, reward sum]
+        self._inflight = ({}, {})                # (profiles, rewards) taken by flush(), until it commits
+        self._pending_daily = {}                 # (user_id, day) -> aggregate row (latest wins)
+        self._lock = threading.Lock(); self._wake = threading.Event()
+        self._read_lock = threading.Lock(); self._reader = None
+        self._thread = None; self._closed = False
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL"); con.execute("PRAGMA synchronous=NORMAL")
+        con.executescript(_SCHEMA)
+        return con
+
+    def load(self, user_id: str):
+        """The user's saved engine.user_snapshot() dict, or None."""
+        with self._lock:   # queue first: whatever leaves it afterwards is committed before we read the row
+            queued = [(prof.get(user_id), {k[1:]: c for k, c in rew.items() if k[0] == user_id})
+                      for prof, rew in (self._inflight, (self._pending, self._pending_rewards))]
+        try:
+            with self._read_lock:
+                if self._reader is None: self._reader = self._connect()
+                row = self._reader.execute("SELECT payload FROM user_model WHERE user_id=?", (user_id,)).fetchone()
+        except sqlite3.Error:
+            row = None
+        snap = json.loads(row[0]) if row else None
+        for fields, rewards in queued:
+            if fields is None and not rewards: continue
+            snap = snap or empty_snapshot()
+            if fields is not None: _apply_fields(snap, json.loads(fields))
+            _apply_rewards(snap, rewards)
+        return snap
+
+    def save(self, user_id: str, state: dict):
+        """Queue the profile fields of an engine.user_snapshot() (its stats travel via add_reward()).
+
+        Serialised here so later in-session mutation can't race the writer.
+        """
+        fields = {k: state[k] for k in PROFILE_FIELDS if k in state}
+        payload = json.dumps(fields, separators=(",", ":"))
+        with self._lock:
+            prev = self._pending.get(user_id)
+            if prev is not None:
+                merged = json.loads(prev); _apply_fields(merged, json.loads(payload))
+                payload = json.dumps(merged, separators=(",", ":"))
+            self._pending[user_id] = payload
+            if len(self._pending) >= self.batch: self._wake.set()
+        self._ensure_writer()
+
+    def add_reward(self, user_id: str, activity: str, context, r: float):
+        """Queue one bandit reward for `activity` (and `context`, if any); O(1), never touches disk."""
+        with self._lock:
+            acc = self._pending_rewards.get((user_id, activity, context or ""))
+            if acc is None: acc = self._pending_rewards[(user_id, activity, context or "")] = [0, 0.0]
+            acc[0] += 1; acc[1] += float(r)
+        self._ensure_writer()
+
+    def save_daily(self, user_id: str, agg: dict):
+        """Queue one day's {"day", "n", "mean", "min", "max", "last"} aggregate."""
+        row = (user_id, agg["day"], agg["n"], agg["mean"], agg["min"], agg["max"], agg["last"])
+        with self._lock:
+            self._pending_daily[(user_id, agg["day"])] = row
+        self._ensure_writer()
+
+    def load_daily(self, user_id: str, since: str = ""):
+        """[{"day", "n", "mean", "min", "max", "last"}] for days ≥ `since` (ISO date), oldest first."""
+        cols = ("day", "n", "mean", "min", "max", "last")
+        with self._lock:
+            rows = {k[1]: r[1:] for k, r in self._pending_daily.items() if k[0] == user_id and k[1] >= since}
+        try:
+            with self._read_lock:
+                if self._reader is None: self._reader = self._connect()
+                for r in self._reader.execute("SELECT day,n,mean,min,max,last FROM daily_signal "
+                                              "WHERE user_id=? AND day>=? ORDER BY day", (user_id, since)):
+                    rows.setdefault(r[0], r)
+        except sqlite3.Error:
+            pass
+        return [dict(zip(cols, rows[d])) for d in sorted(rows)]
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="model-store", daemon=True)
+                self._thread.start()
+
+    def flush(self, con=None):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            rewards, self._pending_rewards = self._pending_rewards, {}
+            daily, self._pending_daily = self._pending_daily, {}
+            self._inflight = (batch, rewards)    # still visible to load() until committed
+        if not batch and not rewards and not daily: return 0
+        by_user = {}
+        for (u, act, ctx), acc in rewards.items(): by_user.setdefault(u, {})[(act, ctx)] = acc
+        own = con is None
+        con = con or self._connect()
+        try:
+            now = time.time()
+            with con:
+                con.execute("BEGIN IMMEDIATE")   # read-modify-write: no other process may write in between
+                rows = []
+                for u in set(batch) | set(by_user):
+                    old = con.execute("SELECT payload FROM user_model WHERE user_id=?", (u,)).fetchone()
+                    snap = json.loads(old[0]) if old else empty_snapshot()
+                    if u in batch: _apply_fields(snap, json.loads(batch[u]))
+                    _apply_rewards(snap, by_user.get(u, {}))
+                    rows.append((u, json.dumps(snap, separators=(",", ":")), now))
+                con.executemany("INSERT INTO user_model(user_id,payload,updated) VALUES(?,?,?) "
+                                "ON CONFLICT(user_id) DO UPDATE SET payload=excluded.payload, updated=excluded.updated",
+                                rows)
+                con.executemany("INSERT OR REPLACE INTO daily_signal(user_id,day,n,mean,min,max,last) "
+                                "VALUES(?,?,?,?,?,?,?)", daily.values())
+        except sqlite3.Error:
+            with self._lock:                     # retry next round: under newer fields, rewards added back
+                for u, p in batch.items():
+                    newer = self._pending.get(u)
+                    if newer is not None:
+                        p = json.loads(p); _apply_fields(p, json.loads(newer)); p = json.dumps(p, separators=(",", ":"))
+                    self._pending[u] = p
+                for k, acc in rewards.items():
+                    cur = self._pending_rewards.setdefault(k, [0, 0.0]); cur[0] += acc[0]; cur[1] += acc[1]
+                for k, r in daily.items(): self._pending_daily.setdefault(k, r)
+                self._inflight = ({}, {})
+            return 0
+        finally:
+            if own: con.close()
+        with self._lock:
+            self._inflight = ({}, {})
+        return len(batch) + len(rewards) + len(daily)
+
+    def _run(self):
+        con = self._connect()
+        while not self._closed:
+            self._wake.wait(self.flush_s); self._wake.clear()
+            self.flush(con)
+        self.flush(con); con.close()
+
+    def close(self):
+        self._closed = True; self._wake.set()
+        if self._thread is not None: self._thread.join(timeout=5)
+        else: self.flush()
+
+
+PROFILE_FIELDS = ("favorites", "activities", "exports")   # what save() persists; stats come from add_reward()
+
+def empty_snapshot() -> dict:
+    return {"model": {"overall": {}}, "favorites": [], "activities": [], "contexts": {"acts": [], "contexts": []},
+            "exports": {}}
+
+def _apply_fields(snap: dict, fields: dict):
+    """Profile fields onto a snapshot: favourites replace, activities union, export SEQUENCEs keep the higher."""
+    if "favorites" in fields: snap["favorites"] = fields["favorites"]
+    if "activities" in fields:
+        snap["activities"] = list(dict.fromkeys(snap.get("activities", []) + fields["activities"]))
+    exports = snap.setdefault("exports", {})
+    for uid, rec in (fields.get("exports") or {}).items():
+        if uid not in exports or rec[1] >= exports[uid][1]: exports[uid] = rec
+
+def _add(n: int, value: float, count: int, total: float):
+    """Running mean over n values plus `count` more summing to `total` — same as `count` bandit.update() calls."""
+    n2 = n + count
+    return n2, value + (total - count * value) / n2
+
+def _apply_rewards(snap: dict, rewards: dict):
+    """Add {(activity, context): [count, reward sum]} to the snapshot's overall and per-context stats."""
+    if not rewards: return
+    overall = snap.setdefault("model", {}).setdefault("overall", {})
+    ctx = snap.get("contexts") or {"acts": [], "contexts": []}; snap["contexts"] = ctx
+    acts = ctx.setdefault("acts", []); rows = {row[0]: row for row in ctx.setdefault("contexts", [])}
+    for (act, key), (count, total) in rewards.items():
+        s = overall.setdefault(act, {"n": 0, "value": 0.0})
+        s["n"], s["value"] = _add(s["n"], s["value"], count, total)
+        if not key: continue
+        if act not in acts:
+            acts.append(act)
+            for row in ctx["contexts"]: row[1].append(0); row[2].append(0.0)
+        row = rows.get(key)
+        if row is None: row = rows[key] = [key, [0] * len(acts), [0.0] * len(acts)]
+        else: ctx["contexts"].remove(row)
+        ctx["contexts"].append(row)            # most recently used last, as ContextTables.to_json() orders them
+        i = acts.index(act)
+        while len(row[1]) < len(acts): row[1].append(0); row[2].append(0.0)
+        row[1][i], row[2][i] = _add(row[1][i], row[2][i], count, total)
+
+
+model_store = ModelStore()
+atexit.register(model_store.close)
@@ -0,0 +1,36 @@
+# Checks for the per-context bandit tables. Run with `python -m pytest calmsync`.
+from datetime import datetime, timedelta
+from itertools import product
+
+from calmsync import bandit
+from calmsync.ics import TZ
+
+
+def all_context_keys():
+    monday = datetime(2026, 3, 2, tzinfo=TZ)
+    keys = {bandit.context_key(monday + timedelta(days=d, hours=h), precip, 0.0, sma)
+            for d, h, precip, sma in product((0, 5), (9, 14, 20), (0.0, 2.0), (30, 80))}
+    return sorted(keys)
+
+def test_default_cap_keeps_every_context():
+    assert len(all_context_keys()) == bandit.CONTEXT_BUCKETS
+    ct = bandit.ContextTables(["Walk"])
+    for k in all_context_keys(): ct.update(k, "Walk", 1.0)
+    assert len(ct) == bandit.CONTEXT_BUCKETS                       # a regular user loses nothing
+
+def test_lru_eviction_fires_beyond_the_cap():
+    ct = bandit.ContextTables(["Walk", "Tea"], max_contexts=4)
+    keys = all_context_keys()[:6]
+    for k in keys: ct.update(k, "Walk", 1.0)
+    assert list(ct.contexts) == keys[-4:]                          # the oldest were evicted
+    ct.values(keys[2], {}, ["Walk"])                               # a read refreshes recency…
+    ct.update(keys[0], "Tea", 1.0)                                 # …so the next eviction skips it
+    assert keys[2] in ct.contexts and keys[3] not in ct.contexts and len(ct) == 4
+
+def test_json_round_trip_keeps_the_cap():
+    ct = bandit.ContextTables(["Walk"], max_contexts=4)
+    for k in all_context_keys(): ct.update(k, "Walk", 2.0)
+    back = bandit.ContextTables.from_json(ct.to_json(), max_contexts=4)
+    assert list(back.contexts) == list(ct.contexts)
+    assert back.values(next(iter(back.contexts)), {}, ["Walk"], min_n=1)["Walk"] == {"n": 1, "value": 2.0}
+    assert len(bandit.ContextTables.from_json(ct.to_json(), max_contexts=2)) == 2
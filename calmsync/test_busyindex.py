@@ -0,0 +1,125 @@
+# EventTable/BusyIndex lookups against plain linear scans over the same events.
+# Run with `python -m pytest calmsync`.
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from calmsync import engine
+from calmsync.busyindex import BusyIndex, EventTable
+from calmsync.ics import TZ
+
+BASE = datetime(2026, 3, 1, tzinfo=TZ)
+
+
+def at(minutes):
+    """BASE + elapsed minutes as a real local instant (wall-clock arithmetic would land in the DST gap)."""
+    return (BASE.astimezone(timezone.utc) + timedelta(minutes=minutes)).astimezone(TZ)
+
+def random_events(rng, n, days=60):
+    out = []
+    for _ in range(n):
+        m = rng.randrange(0, days * 24 * 60, 5)
+        out.append((at(m), at(m + rng.choice((15, 30, 60, 600, 5 * 24 * 60))), rng.choice("abc")))
+    return out
+
+
+def overlaps_scan(events, start, end):                     # the pre-index overlaps_busy
+    return any(start < e and end > s for s, e, _ in events)
+
+def slots_scan(events, day, duration_min, step_min=30, cutoff=None):   # the pre-index list_available_slots
+    cur, latest = engine.day_bounds(day); dur = timedelta(minutes=duration_min); out = []
+    while cur + dur <= latest:
+        if not overlaps_scan(events, cur, cur + dur) and (cutoff is None or cur >= cutoff): out.append(cur)
+        cur += timedelta(minutes=step_min)
+    return out
+
+
+def test_overlaps_matches_scan():
+    rng = random.Random(1)
+    for _ in range(200):
+        events = random_events(rng, rng.randint(0, 60)); idx = BusyIndex(events)
+        for _ in range(30):
+            m = rng.randrange(-600, 61 * 24 * 60, 5)
+            s, e = at(m), at(m + rng.choice((5, 15, 30, 90)))
+            assert idx.overlaps(s, e) == overlaps_scan(events, s, e)
+
+def test_free_gaps_cover_exactly_the_free_time():
+    rng = random.Random(2)
+    for _ in range(200):
+        events = random_events(rng, rng.randint(0, 40), days=3); idx = BusyIndex(events)
+        h = rng.randint(0, 48); lo, hi = at(h * 60), at((h + rng.randint(1, 30)) * 60)
+        gaps = list(idx.free_gaps(lo, hi))
+        assert all(a < b for a, b in gaps) and all(b < c for (_, b), (c, _) in zip(gaps, gaps[1:]))
+        for m in range(0, int((hi - lo).total_seconds() // 60), 5):
+            t = lo + timedelta(minutes=m)
+            free = not any(s <= t < e for s, e, _ in events)
+            assert any(a <= t < b for a, b in gaps) == free, t
+
+def test_slots_match_scan_at_any_step_and_duration():
+    rng = random.Random(3)
+    for _ in range(100):
+        events = random_events(rng, rng.randint(0, 80), days=40); idx = BusyIndex(events)
+        day = (BASE + timedelta(days=rng.randint(0, 40))).date()     # spans the 29 Mar DST change
+        lo, hi = engine.day_bounds(day)
+        for step, dur in ((30, 30), (15, 45), (10, 60), (30, rng.choice(engine.SLOT_DURATIONS))):
+            got = list(idx.slots(lo, hi, timedelta(minutes=dur), timedelta(minutes=step)))
+            assert got == slots_scan(events, day, dur, step), (day, step, dur)
+        table = idx.slot_table(lo, hi, [timedelta(minutes=d) for d in (15, 40)], timedelta(minutes=30))
+        assert table[timedelta(minutes=40)] == slots_scan(events, day, 40)
+
+def test_list_available_slots_matches_scan():
+    rng = random.Random(4)
+    for _ in range(50):
+        events = random_events(rng, rng.randint(0, 80), days=10)
+        state = engine.init_state({"user_id": "u"}); engine.store_calendar_events(state, EventTable(events))
+        day = (BASE + timedelta(days=rng.randint(0, 10))).date(); lo, _ = engine.day_bounds(day)
+        nowr = lo + timedelta(minutes=rng.randrange(0, 15 * 60, 7))
+        for dur in (15, 30, 45, 60, 25):
+            cutoff = nowr if rng.random() < 0.5 else None
+            when = nowr if cutoff else nowr - timedelta(days=1)
+            assert engine.list_available_slots(state, lo, dur, nowr=when) == slots_scan(events, day, dur, cutoff=cutoff)
+
+
+def test_count_between_matches_scan():
+    rng = random.Random(13)
+    for _ in range(300):
+        events = random_events(rng, rng.randint(0, 80))
+        table = EventTable(events)
+        for _ in range(20):
+            m = rng.randint(-1000, 61 * 24 * 60); lo, hi = at(m), at(m + rng.randint(0, 30 * 24 * 60))
+            assert table.count_between(lo, hi) == sum(1 for s, e, _ in events if s <= hi and e >= lo)
+
+
+# ── multi-feed merge ─────────────────────────────────────────────────────────
+def rows(table):
+    return list(table._rows())
+
+def test_merge_matches_rebuild():
+    rng = random.Random(17)
+    for _ in range(2000):
+        feeds = [random_events(rng, rng.randint(0, 25), days=7) for _ in range(rng.randint(1, 4))]
+        if len(feeds) > 1 and rng.random() < 0.5: feeds[1] += rng.sample(feeds[0], len(feeds[0]) // 2)  # shared events
+        merged = EventTable.merge([EventTable(f) for f in feeds])
+        most = Counter()                                                       # each row as often as its busiest feed
+        for f in feeds: most |= Counter(f)
+        rebuilt = EventTable(most.elements())
+        assert sorted(rows(merged)) == sorted(rows(rebuilt))
+        assert rows(merged) == sorted(rows(merged), key=lambda r: r[:2])          # still (start, end) order
+        assert merged.max_len == rebuilt.max_len
+        assert (merged.index.starts, merged.index.ends) == (rebuilt.index.starts, rebuilt.index.ends)
+
+def test_merge_keeps_a_feeds_own_repeats():
+    a = (at(0), at(30), "Busy")
+    assert len(EventTable.merge([EventTable([a, a]), EventTable([a])])) == 2
+    assert len(EventTable.merge([EventTable([a]), EventTable([a]), EventTable([a])])) == 1
+
+def test_failed_feed_keeps_the_others():
+    work, team = EventTable([(at(60), at(120), "1:1")]), EventTable([(at(90), at(180), "Standup")])
+    urls = ["https://x/work.ics", "https://x/team.ics", "https://x/home.ics"]
+    results = {"calendar:" + urls[0]: work, "calendar:" + urls[1]: team}
+    state = engine.init_state({"user_id": "u"})
+    engine.apply_calendars(state, urls, results, {"calendar:" + urls[2]: "timed out after 10s"}, BASE)
+    assert list(zip(state["calendar_index"].starts, state["calendar_index"].ends)) == [
+        (int(at(60).timestamp()), int(at(180).timestamp()))]
+    assert state["calendar_feed_status"][urls[2]] == "failed (timed out after 10s)"
+    assert "from 2 of 3 calendars" in state["calendar_last_status"] and "home.ics: failed" in state["calendar_last_status"]
@@ -0,0 +1,104 @@
+# Shared calendar feed cache against a local HTTP server: single-flight downloads,
+# ETag revalidation and LRU eviction. Run with `python -m pytest calmsync`.
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from calmsync.busyindex import EventTable
+from calmsync.feedcache import CalendarCache
+from calmsync.ics import TZ
+
+WS = datetime(2026, 3, 2, tzinfo=TZ); WE = WS + timedelta(days=30)
+
+
+def feed(version=1):
+    ev = lambda uid, day: (f"BEGIN:VEVENT\r\nUID:{uid}\r\nDTSTART:202603{day:02d}T090000Z\r\n"
+                           f"DTEND:202603{day:02d}T100000Z\r\nSUMMARY:v{version}\r\nEND:VEVENT\r\n")
+    return ("BEGIN:VCALENDAR\r\n" + ev("a", 3) + ev("b", 4) + "END:VCALENDAR\r\n").encode()
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.hits = []; srv.version = 1; srv.delay = 0.0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.url = lambda name="cal.ics": f"http://127.0.0.1:{srv.server_port}/{name}"
+    yield srv
+    srv.shutdown(); srv.server_close()
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        srv = self.server; etag = f'"v{srv.version}"'
+        if self.path == "/missing.ics":
+            srv.hits.append((self.path, 404)); self.send_response(404); self.end_headers(); return
+        if self.headers.get("If-None-Match") == etag:
+            srv.hits.append((self.path, 304)); self.send_response(304); self.end_headers(); return
+        srv.hits.append((self.path, 200)); time.sleep(srv.delay)
+        body = feed(srv.version)
+        self.send_response(200); self.send_header("ETag", etag); self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_concurrent_sessions_share_one_download(server):
+    cache = CalendarCache(); server.delay = 0.2
+    barrier = threading.Barrier(16); got = []
+
+    def session():
+        barrier.wait(); got.append(cache.get(server.url(), WS, WE))
+
+    threads = [threading.Thread(target=session) for _ in range(16)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert server.hits == [("/cal.ics", 200)]
+    assert len(got) == 16 and all(t is got[0] for t in got) and len(got[0]) == 2
+    assert (cache.stats["misses"], cache.stats["hits"]) == (1, 15)
+    assert not cache._flights                                  # no flight lock outlives its callers
+
+def test_expired_entry_revalidates_with_etag(server):
+    cache = CalendarCache(ttl=0)
+    first = cache.get(server.url(), WS, WE)
+    assert cache.get(server.url(), WS, WE) is first and cache.stats["not_modified"] == 1
+    server.version = 2
+    changed = cache.get(server.url(), WS, WE)
+    assert changed is not first and changed.strings == ("v2",)
+    assert server.hits == [("/cal.ics", 200), ("/cal.ics", 304), ("/cal.ics", 200)]
+
+def test_fresh_entry_is_served_without_a_request_unless_forced(server):
+    cache = CalendarCache(ttl=300)
+    first = cache.get(server.url(), WS, WE)
+    assert cache.get(server.url(), WS + timedelta(days=1), WE) is first   # narrower window is covered
+    assert cache.get(server.url(), WS, WE, force=True) is first            # forced: revalidated, unchanged
+    cache.get(server.url(), WS, WE + timedelta(days=1))                   # wider window: full download
+    assert [code for _, code in server.hits] == [200, 304, 200]
+
+def test_lru_eviction_by_count_and_bytes(server):
+    cache = CalendarCache(max_entries=2)
+    a = cache.get(server.url("a.ics"), WS, WE); cache.get(server.url("b.ics"), WS, WE)
+    cache.get(server.url("a.ics"), WS, WE)                                 # touch a: b is now oldest
+    cache.get(server.url("c.ics"), WS, WE)
+    assert list(cache._entries) == [server.url("a.ics"), server.url("c.ics")] and cache.stats["evictions"] == 1
+    assert cache.get(server.url("a.ics"), WS, WE) is a
+    assert cache._bytes == sum(e.nbytes for e in cache._entries.values())
+
+    small = CalendarCache(max_bytes=1)                                     # the newest entry is always kept
+    small.get(server.url("a.ics"), WS, WE); small.get(server.url("b.ics"), WS, WE)
+    assert list(small._entries) == [server.url("b.ics")]
+
+def test_failed_download_is_not_cached(server):
+    cache = CalendarCache()
+    with pytest.raises(Exception, match="404"):
+        cache.get(server.url("missing.ics"), WS, WE)
+    assert not cache._entries and not cache._flights
+
+def test_merged_tables_are_shared():
+    cache = CalendarCache()
+    a = EventTable([(WS, WS + timedelta(hours=1), "a")]); b = EventTable([(WS, WS + timedelta(hours=2), "b")])
+    m = cache.merged([a, b])
+    assert cache.merged([a, b]) is m and len(m) == 2 and cache.merged([a]) is a
+    assert (cache.stats["merged_builds"], cache.stats["merged_hits"]) == (1, 1)
@@ -0,0 +1,20 @@
+# Regression tests for ICS line handling. Run with `python -m pytest calmsync`.
+from calmsync.ics import iter_ics_events
+
+
+def body(*props):
+    return ("BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nDTSTART:20260105T090000Z\r\nDTEND:20260105T100000Z\r\n".encode()
+            + b"".join(p + b"\r\n" for p in props) + b"END:VEVENT\r\nEND:VCALENDAR\r\n")
+
+def test_fold_inside_multibyte_character():
+    raw = ("SUMMARY:" + "x" * 63 + "Café crème").encode("utf-8")
+    assert raw[74:76] == "é".encode("utf-8")                  # the 75-octet fold splits the é
+    folded = raw[:75] + b"\r\n " + raw[75:]
+    ev, = iter_ics_events(body(folded).splitlines(keepends=True))
+    assert ev["summary"] == "x" * 63 + "Café crème"
+
+def test_str_and_bytes_lines_agree():
+    data = body("SUMMARY:Réunion d’équipe".encode("utf-8"), b"TRANSP:OPAQUE")
+    from_bytes = list(iter_ics_events(data.splitlines()))
+    from_text = list(iter_ics_events(data.decode("utf-8").splitlines()))
+    assert from_bytes == from_text and from_bytes[0]["summary"] == "Réunion d’équipe"
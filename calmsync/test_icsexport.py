@@ -0,0 +1,66 @@
+# ICS export: UIDs stay put across re-plans, SEQUENCE/DTSTAMP only move when an event changes,
+# and deferred downloads never touch the session's registry. Run with `python -m pytest calmsync`.
+import threading
+from datetime import datetime, timedelta, timezone
+
+from calmsync import engine
+from calmsync.ics import TZ, iter_ics_events
+from calmsync.icsexport import calendar_bytes, event_uid, plan_events, stamp_events
+
+FAVS = ["Walk outside", "Stretch", "Tea break"]
+NOW = datetime(2026, 3, 2, 7, 30, tzinfo=TZ)
+
+
+def user(uid="alice"):
+    return engine.init_state({"user_id": uid, "favorite_activities": list(FAVS)})
+
+def props(data: bytes, name: str):
+    return [ln.split(":", 1)[1] for ln in data.decode().split("\r\n") if ln.startswith(name + ":")]
+
+
+def test_uid_depends_on_user_day_and_slot_only():
+    day = NOW.date()
+    assert event_uid("alice", day, "plan") == event_uid("alice", day, "plan")
+    assert len({event_uid("alice", day, "plan"), event_uid("bob", day, "plan"), event_uid("alice", day, "break"),
+                event_uid("alice", day + timedelta(days=1), "plan")}) == 4
+
+def test_replan_keeps_uids_and_bumps_sequence():
+    st = user()
+    first = plan_events(st, nowr=NOW)
+    again = plan_events(st, nowr=NOW)
+    assert calendar_bytes(first) == calendar_bytes(again)                   # unchanged: byte-identical
+    st["model"]["overall"]["Walk outside"]["value"] = 5.0                   # feedback rotates the week
+    moved = plan_events(st, nowr=NOW)
+    assert [e[0] for e in moved] == [e[0] for e in first]
+    assert [e[1] for e in moved] != [e[1] for e in first]
+    assert all(m[4] == f[4] + 1 for m, f in zip(moved, first) if m[1] != f[1])
+
+def test_dtstamp_is_export_time_not_event_start():
+    reg = {}
+    ev, = stamp_events(reg, "alice", (("break", "Tea break", NOW + timedelta(days=2), 15),), now=1_000_000)
+    data = calendar_bytes((ev,))
+    assert props(data, "DTSTAMP") == ["19700112T134640Z"] and props(data, "SEQUENCE") == ["0"]
+    same, = stamp_events(reg, "alice", (("break", "Tea break", NOW + timedelta(days=2), 15),), now=2_000_000)
+    assert same == ev                                                       # no change, no new stamp
+    moved, = stamp_events(reg, "alice", (("break", "Tea break", NOW + timedelta(days=2, hours=1), 15),),
+                          now=2_000_000)
+    assert moved[0] == ev[0] and moved[4] == 1 and moved[5] == datetime.fromtimestamp(2_000_000, timezone.utc)
+
+def test_users_never_share_uids():
+    a, b = plan_events(user("alice"), nowr=NOW), plan_events(user("bob"), nowr=NOW)
+    assert not {e[0] for e in a} & {e[0] for e in b}
+
+def test_export_round_trips_through_the_parser():
+    data = calendar_bytes(plan_events(user(), nowr=NOW), "Breaks")
+    parsed = list(iter_ics_events(data.decode().splitlines()))
+    assert len(parsed) == len(props(data, "UID")) == 7 and all(e["busy"] for e in parsed)
+
+def test_deferred_download_leaves_the_session_registry_alone():
+    st = user()
+    snap = engine.plan_snapshot(st)
+    out = []
+    t = threading.Thread(target=lambda: (out.append(engine.week_plan_ics(snap)), engine.return_exports(snap)))
+    t.start(); t.join()
+    assert st["ics_exports"] == {} and len(st["ics_inbox"]) == 1
+    engine.plan_snapshot(st)                                                # next script run folds it in
+    assert not st["ics_inbox"] and set(st["ics_exports"]) == set(props(out[0], "UID"))
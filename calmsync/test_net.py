@@ -0,0 +1,40 @@
+# gather(): per-source timeouts count from when the source starts running, the deadline
+# from the call. Run with `python -m pytest calmsync`.
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from calmsync import net
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(net, "_pool", pool)
+    yield
+    pool.shutdown(wait=True)
+
+def nap(s, value=None):
+    return lambda: (time.sleep(s), value)[1]
+
+
+def test_queued_time_is_not_charged_to_the_source(one_worker):
+    results, errors = net.gather({"a": (nap(0.2, 1), 0.3), "b": (nap(0.2, 2), 0.3)})
+    assert results == {"a": 1, "b": 2} and not errors
+
+def test_slow_source_times_out_and_others_still_load():
+    t0 = time.monotonic()
+    results, errors = net.gather({"slow": (nap(1.0), 0.1), "fast": (nap(0.05, "ok"), 1.0)})
+    assert results == {"fast": "ok"} and errors == {"slow": "timed out after 0.1s"}
+    assert time.monotonic() - t0 < 0.5
+
+def test_deadline_caps_queued_and_running_sources(one_worker):
+    t0 = time.monotonic()
+    results, errors = net.gather({"a": (nap(0.5), 5.0), "b": (nap(0.0, 2), 5.0)}, deadline_s=0.2)
+    assert not results and errors == {"a": "missed the 0.2s deadline", "b": "missed the 0.2s deadline"}
+    assert time.monotonic() - t0 < 0.4
+
+def test_errors_are_reported_per_source():
+    def boom(): raise ValueError("bad feed")
+    assert net.gather({"x": (boom, 1.0), "y": (nap(0, 3), 1.0)}) == ({"y": 3}, {"x": "bad feed"})
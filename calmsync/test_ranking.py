@@ -0,0 +1,63 @@
+# Slot ranking: the vectorised fit test agrees with BusyIndex.slots across DST changes,
+# and the scores order the way their parts say. Run with `python -m pytest calmsync`.
+import random
+from datetime import datetime, timedelta, timezone
+
+from calmsync import ranking
+from calmsync.busyindex import BusyIndex
+from calmsync.ics import TZ
+
+
+def at(base, minutes):
+    return (base.astimezone(timezone.utc) + timedelta(minutes=minutes)).astimezone(TZ)
+
+def random_calendar(rng, base, days):
+    out = []
+    for _ in range(rng.randint(0, 60)):
+        m = rng.randrange(0, days * 24 * 60, 15)
+        out.append((at(base, m), at(base, m + rng.choice((15, 30, 45, 60, 120, 600))), "busy"))
+    return BusyIndex(out)
+
+def expected(idx, now, days, duration_min, step_min):
+    out = []
+    for k in range(days):
+        d = now.date() + timedelta(days=k)
+        lo = datetime(d.year, d.month, d.day, ranking.DAY_START_H, tzinfo=TZ)
+        hi = datetime(d.year, d.month, d.day, ranking.DAY_END_H, tzinfo=TZ)
+        out += [int(s.timestamp()) for s in idx.slots(lo, hi, timedelta(minutes=duration_min),
+                                                       timedelta(minutes=step_min), not_before=now)]
+    return out
+
+
+def test_rank_fits_exactly_the_index_slots_across_dst():
+    rng = random.Random(19)
+    for _ in range(300):
+        base = rng.choice((datetime(2026, 3, 27, tzinfo=TZ), datetime(2026, 10, 23, tzinfo=TZ)))   # DST on the 29th / 25th
+        idx = random_calendar(rng, base, 5)
+        now = at(base, rng.randrange(0, 2 * 24 * 60, 7)); days = rng.randint(1, 4)
+        dur, step = rng.choice((15, 30, 45, 60, 90)), rng.choice((15, 30))
+        got = ranking.rank(idx.starts, idx.ends, now, dur * 60, days=days, step_s=step * 60, k=10_000)
+        assert sorted(t for t, _, _ in got) == expected(idx, now, days, dur, step), (now, dur, step)
+        scores = [s for _, s, _ in got]
+        assert scores == sorted(scores, reverse=True)
+        top = ranking.rank(idx.starts, idx.ends, now, dur * 60, days=days, step_s=step * 60, k=5)
+        assert [s for _, s, _ in top] == scores[:5]
+
+def test_outdoor_ranking_avoids_rain():
+    now = datetime(2026, 6, 1, 7, 0, tzinfo=TZ); h0 = int(now.timestamp())
+    precip = [0.0] * 48; precip[2:6] = [3.0] * 4                   # rain 09:00–13:00
+    free = BusyIndex()
+    dry = ranking.rank(free.starts, free.ends, now, 1800, days=1, precip=precip, hour0=h0, outdoor=True, k=3)
+    assert all(not (9 <= datetime.fromtimestamp(t, TZ).hour < 13) for t, _, _ in dry)
+    indoor = ranking.rank(free.starts, free.ends, now, 1800, days=1, precip=precip, hour0=h0, k=1)
+    assert datetime.fromtimestamp(indoor[0][0], TZ).hour == 8 and indoor[0][2]["rain"] == 0.0
+
+def test_roomier_gap_wins_over_a_squeeze():
+    now = datetime(2026, 6, 1, 7, 0, tzinfo=TZ)
+    day = lambda h, m=0: now.replace(hour=h, minute=m)
+    idx = BusyIndex([(day(8), day(10), "m"), (day(10, 30), day(12, 30), "m"), (day(16), day(22), "m")])
+    top = ranking.rank(idx.starts, idx.ends, now, 1800, days=1, k=3)
+    assert [datetime.fromtimestamp(t, TZ).strftime("%H:%M") for t, _, _ in top] == ["13:00", "13:30", "14:00"]
+    squeeze, = (p for t, _, p in ranking.rank(idx.starts, idx.ends, now, 1800, days=1, k=20)
+                if datetime.fromtimestamp(t, TZ).hour == 10)
+    assert squeeze["gap"] < top[0][2]["gap"] and squeeze["soon"] > top[0][2]["soon"]
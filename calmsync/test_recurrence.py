@@ -0,0 +1,131 @@
+# Regression tests for RRULE expansion and the ICS recurrence handling around it
+# (EXDATE, RECURRENCE-ID overrides, TZID wall clock). Run with `python -m pytest calmsync`.
+import random
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from calmsync.ics import TZ, _parse_ics_dt, iter_ics_events
+from calmsync.recurrence import iter_occurrences, parse_rrule
+
+NY = ZoneInfo("America/New_York")
+
+
+def feed(*events):
+    return ["BEGIN:VCALENDAR"] + [ln for ev in events for ln in ["BEGIN:VEVENT", *ev, "END:VEVENT"]] + ["END:VCALENDAR"]
+
+def series(rule, start="20260105T090000", end="20260105T100000", tzid="Europe/Amsterdam", uid="s1", extra=()):
+    return [f"UID:{uid}", f"DTSTART;TZID={tzid}:{start}", f"DTEND;TZID={tzid}:{end}", f"RRULE:{rule}",
+            "SUMMARY:Standup", *extra]
+
+def starts(lines, ws, we):
+    return [e["start"] for e in iter_ics_events(lines, ws, we)]
+
+def days(lines, ws, we):
+    return [s.date().isoformat() for s in starts(lines, ws, we)]
+
+def local(*a, tz=TZ):
+    return datetime(*a, tzinfo=tz)
+
+
+# ── rule parsing ─────────────────────────────────────────────────────────────
+def test_unsupported_parts_are_rejected():
+    for rule in ("FREQ=YEARLY;BYWEEKNO=20", "FREQ=YEARLY;BYYEARDAY=100", "FREQ=DAILY;BYHOUR=9,17",
+                 "FREQ=YEARLY;BYDAY=20MO", "FREQ=MONTHLY;BYSETPOS=0;BYDAY=MO", "FREQ=HOURLY"):
+        assert parse_rrule(rule, _parse_ics_dt) is None, rule
+
+def test_invalid_combinations_are_rejected():
+    for rule in ("FREQ=DAILY;BYDAY=1MO", "FREQ=WEEKLY;BYDAY=-1FR", "FREQ=WEEKLY;BYMONTHDAY=15"):
+        assert parse_rrule(rule, _parse_ics_dt) is None, rule
+
+def test_supported_parts_parse():
+    r = parse_rrule("FREQ=MONTHLY;INTERVAL=2;BYDAY=MO,-1FR;WKST=MO;COUNT=4;", _parse_ics_dt)
+    assert (r.freq, r.interval, r.count, r.byday) == ("MONTHLY", 2, 4, ((0, 0), (-1, 4)))
+
+def test_unsupported_rule_falls_back_to_first_instance():
+    lines = feed(series("FREQ=YEARLY;BYWEEKNO=2,3;BYDAY=MO"))
+    assert days(lines, local(2026, 1, 1), local(2026, 12, 31)) == ["2026-01-05"]
+
+
+# ── expansion ────────────────────────────────────────────────────────────────
+def test_bysetpos_last_weekday_of_month():
+    lines = feed(series("FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1", start="20261001T090000",
+                        end="20261001T100000"))
+    assert days(lines, local(2026, 10, 1), local(2027, 1, 31)) == ["2026-10-30", "2026-11-30", "2026-12-31",
+                                                                    "2027-01-29"]
+
+def test_bysetpos_first_and_second():
+    lines = feed(series("FREQ=MONTHLY;BYDAY=SA,SU;BYSETPOS=1,2", start="20260301T090000", end="20260301T100000"))
+    assert days(lines, local(2026, 3, 1), local(2026, 4, 30)) == ["2026-03-01", "2026-03-07", "2026-04-04",
+                                                                   "2026-04-05"]
+
+def test_yearly_bymonth_out_of_order_is_date_sorted():
+    lines = feed(series("FREQ=YEARLY;BYMONTH=12,1", start="20261215T090000", end="20261215T100000"))
+    assert days(lines, local(2026, 12, 1), local(2027, 2, 1)) == ["2026-12-15", "2027-01-15"]
+
+def test_yearly_count_follows_date_order():
+    lines = feed(series("FREQ=YEARLY;BYMONTH=11,3;BYMONTHDAY=1;COUNT=3", start="20260301T090000",
+                        end="20260301T100000"))
+    assert days(lines, local(2026, 1, 1), local(2030, 1, 1)) == ["2026-03-01", "2026-11-01", "2027-03-01"]
+
+def test_monthly_nth_weekday_and_negative_monthday():
+    lines = feed(series("FREQ=MONTHLY;BYDAY=-1FR;COUNT=3", start="20260130T090000", end="20260130T100000"),
+                 series("FREQ=MONTHLY;BYMONTHDAY=-1;COUNT=3", start="20260131T120000", end="20260131T130000", uid="s2"))
+    assert days(lines, local(2026, 1, 1), local(2026, 12, 31)) == [
+        "2026-01-30", "2026-02-27", "2026-03-27", "2026-01-31", "2026-02-28", "2026-03-31"]
+
+def test_daily_negative_monthday():
+    lines = feed(series("FREQ=DAILY;BYMONTHDAY=-1,1", start="20260101T090000", end="20260101T100000"))
+    assert days(lines, local(2026, 1, 1), local(2026, 3, 31, 23)) == [
+        "2026-01-01", "2026-01-31", "2026-02-01", "2026-02-28", "2026-03-01", "2026-03-31"]
+
+def test_until_is_inclusive_and_date_until_covers_the_day():
+    lines = feed(series("FREQ=DAILY;UNTIL=20260107T080000Z"), series("FREQ=DAILY;UNTIL=20260107", uid="s2"))
+    assert days(lines, local(2026, 1, 1), local(2026, 1, 31)) == [
+        "2026-01-05", "2026-01-06", "2026-01-07", "2026-01-05", "2026-01-06", "2026-01-07"]
+
+def test_window_jump_matches_full_walk():
+    rng = random.Random(7)
+    for _ in range(300):
+        freq = rng.choice(("DAILY", "WEEKLY", "MONTHLY", "YEARLY"))
+        rule = f"FREQ={freq};INTERVAL={rng.randint(1, 3)}"
+        if freq == "WEEKLY": rule += ";BYDAY=" + ",".join(rng.sample(list("MO TU WE TH FR SA SU".split()), 2))
+        if freq == "MONTHLY": rule += rng.choice(("", ";BYMONTHDAY=1,15,-1", ";BYDAY=2TU", ";BYDAY=MO,FR;BYSETPOS=-1"))
+        if freq == "YEARLY": rule += rng.choice(("", ";BYMONTH=9,2", ";BYMONTH=6;BYDAY=SU"))
+        r = parse_rrule(rule, _parse_ics_dt)
+        start = local(2024, rng.randint(1, 12), rng.randint(1, 28), rng.randint(6, 20))
+        dur = timedelta(minutes=rng.choice((30, 60, 600)))
+        ws = start + timedelta(days=rng.randint(0, 900)); we = ws + timedelta(days=rng.randint(1, 120))
+        full = [o for o in iter_occurrences(start, dur, r, start, we) if o + dur >= ws]
+        assert list(iter_occurrences(start, dur, r, ws, we)) == full, rule
+        assert full == sorted(full), rule
+
+
+# ── EXDATE / RECURRENCE-ID / TZID ────────────────────────────────────────────
+def test_exdate_removes_instances():
+    lines = feed(series("FREQ=DAILY;COUNT=5", extra=("EXDATE;TZID=Europe/Amsterdam:20260106T090000,20260108T090000",)))
+    assert days(lines, local(2026, 1, 1), local(2026, 1, 31)) == ["2026-01-05", "2026-01-07", "2026-01-09"]
+
+def test_utc_exdate_matches_local_instance():
+    lines = feed(series("FREQ=DAILY;COUNT=3", extra=("EXDATE:20260106T080000Z",)))
+    assert days(lines, local(2026, 1, 1), local(2026, 1, 31)) == ["2026-01-05", "2026-01-07"]
+
+def test_recurrence_id_moves_one_instance():
+    moved = ["UID:s1", "RECURRENCE-ID;TZID=Europe/Amsterdam:20260106T090000",
+             "DTSTART;TZID=Europe/Amsterdam:20260106T150000", "DTEND;TZID=Europe/Amsterdam:20260106T160000",
+             "SUMMARY:Standup (moved)"]
+    got = starts(feed(series("FREQ=DAILY;COUNT=3"), moved), local(2026, 1, 1), local(2026, 1, 31))
+    assert sorted(got) == [local(2026, 1, 5, 9), local(2026, 1, 6, 15), local(2026, 1, 7, 9)]
+
+def test_cancelled_override_drops_instance():
+    cancelled = ["UID:s1", "RECURRENCE-ID;TZID=Europe/Amsterdam:20260106T090000",
+                 "DTSTART;TZID=Europe/Amsterdam:20260106T090000", "DTEND;TZID=Europe/Amsterdam:20260106T100000",
+                 "STATUS:CANCELLED"]
+    lines = feed(series("FREQ=DAILY;COUNT=3"), cancelled)
+    assert days(lines, local(2026, 1, 1), local(2026, 1, 31)) == ["2026-01-05", "2026-01-07"]
+
+def test_tzid_series_keeps_wall_clock_across_dst():
+    lines = feed(series("FREQ=WEEKLY;COUNT=3", start="20260301T090000", end="20260301T093000",
+                        tzid="America/New_York"))
+    got = [s.astimezone(NY) for s in starts(lines, local(2026, 2, 1), local(2026, 4, 1))]
+    assert [(s.day, s.hour) for s in got] == [(1, 9), (8, 9), (15, 9)]   # US DST starts 8 Mar
+    assert [s.utcoffset() for s in got] == [timedelta(hours=-5), timedelta(hours=-4), timedelta(hours=-4)]
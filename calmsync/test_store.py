@@ -0,0 +1,94 @@
+# Write-behind model store: queued rewards add up across sessions and stay visible until
+# committed. Run with `python -m pytest calmsync`.
+import json
+import random
+import sqlite3
+import threading
+
+import pytest
+
+from calmsync import bandit, engine
+from calmsync.store import ModelStore
+
+ACTS = ["Walk outside", "Stretch", "Tea break"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    ms = ModelStore(str(tmp_path / "model.db"))
+    ms._ensure_writer = lambda: None          # flush by hand
+    return ms
+
+def session(store, uid="u"):
+    state = engine.init_state({"user_id": uid, "favorite_activities": list(ACTS)})
+    saved = store.load(uid)
+    if saved: engine.restore_user(state, saved)
+    return state
+
+def feedback(store, state, act, delta, exp, ctx=None):
+    r = engine.bandit_update(state, act, delta, exp, ctx)
+    store.add_reward(state["user_id"], act, ctx, r)
+    store.save(state["user_id"], engine.user_snapshot(state))
+
+
+def test_stale_tabs_add_up(store):
+    a, b = session(store), session(store)
+    feedback(store, a, "Tea break", -2, 7, "morning|weekday|dry|ok"); store.flush()
+    feedback(store, b, "Tea break", -1, 5, "morning|weekday|dry|ok")   # b never saw a's feedback
+    feedback(store, b, "Stretch", 1, 3); store.flush()
+    ref = {}
+    for r in (bandit.reward(-2, 7), bandit.reward(-1, 5)): bandit.update(ref, "Tea break", r)
+    saved = store.load("u")
+    assert saved["model"]["overall"]["Tea break"]["n"] == 2
+    assert saved["model"]["overall"]["Tea break"]["value"] == pytest.approx(ref["Tea break"]["value"])
+    assert saved["model"]["overall"]["Stretch"]["n"] == 1
+    ct = bandit.ContextTables.from_json(saved["contexts"])
+    assert ct.values("morning|weekday|dry|ok", {}, ["Tea break"], min_n=1)["Tea break"]["n"] == 2
+
+def test_counts_and_sums_match_sequential_updates(store):
+    rng = random.Random(3); ref = {}
+    for _ in range(200):
+        act = rng.choice(ACTS); r = rng.uniform(-6, 6)
+        bandit.update(ref, act, r); store.add_reward("u", act, None, r)
+    store.flush()
+    got = store.load("u")["model"]["overall"]
+    for act in ref:
+        assert got[act]["n"] == ref[act]["n"] and got[act]["value"] == pytest.approx(ref[act]["value"])
+
+def test_queued_and_inflight_writes_are_readable(store):
+    store.add_reward("u", "Stretch", None, 2.0); store.save("u", {"favorites": ACTS, "activities": ACTS})
+    assert store.load("u")["model"]["overall"]["Stretch"] == {"n": 1, "value": 2.0}
+    entered, release = threading.Event(), threading.Event()
+    real = store._connect()
+
+    class Slow:                                 # holds the flush between its queue swap and the commit
+        def __getattr__(self, k): return getattr(real, k)
+        def __enter__(self): return real.__enter__()
+        def __exit__(self, *exc): entered.set(); release.wait(); return real.__exit__(*exc)
+
+    t = threading.Thread(target=store.flush, args=(Slow(),)); t.start(); entered.wait()
+    try:
+        assert not store._pending and store.load("u")["model"]["overall"]["Stretch"]["n"] == 1
+    finally:
+        release.set(); t.join()
+    assert store.load("u")["favorites"] == ACTS and store.load("u")["model"]["overall"]["Stretch"]["n"] == 1
+
+def test_failed_flush_requeues_rewards(store):
+    store.add_reward("u", "Stretch", None, 1.0)
+
+    class Broken:
+        def __enter__(self): raise sqlite3.OperationalError("disk I/O error")
+        def __exit__(self, *exc): return False
+        def execute(self, *a): raise sqlite3.OperationalError("disk I/O error")
+
+    assert store.flush(Broken()) == 0
+    store.add_reward("u", "Stretch", None, 3.0); store.flush()
+    assert store.load("u")["model"]["overall"]["Stretch"] == {"n": 2, "value": 2.0}
+
+def test_profile_save_does_not_touch_stats(store):
+    store.add_reward("u", "Stretch", None, 4.0); store.flush()
+    stale = engine.init_state({"user_id": "u", "favorite_activities": ACTS[:1]})   # knows nothing learned
+    store.save("u", engine.user_snapshot(stale)); store.flush()
+    saved = store.load("u")
+    assert saved["favorites"] == ACTS[:1] and saved["model"]["overall"]["Stretch"] == {"n": 1, "value": 4.0}
+    assert json.loads(json.dumps(saved)) == saved
@@ -0,0 +1,46 @@
+# Visual: SMA gradient bar (pastel red → yellow → green)
+import urllib.parse
+
+
+def sma_gradient_svg(score: int):
+    """Return a pastel horizontal gradient bar with a circular marker for SMA (1–100)."""
+    w, h = 288, 30
+    # clamp score and map to [0, w-16] then offset by radius (8) so the circle stays within
+    s = 0 if score is None else max(0, min(int(score), 100))
+    x = (w - 16) * s / 100.0
+    svg = f"""
+    <svg width="{w}" height="{h}" viewBox="0 0 {w} {h}" xmlns="http://www.w3.org/2000/svg">
+      <defs>
+        <linearGradient id="smaGrad" x1="0" x2="1" y1="0" y2="0">
+          <stop offset="0%" stop-color="#ffb3c6"/>
+          <stop offset="50%" stop-color="#ffeabf"/>
+          <stop offset="100%" stop-color="#b5f5b2"/>
+        </linearGradient>
+      </defs>
+      <rect x="0" y="{h/3:.1f}" width="{w}" height="{h/3:.1f}" rx="8" fill="url(#smaGrad)" />
+      <circle cx="{x+8:.1f}" cy="{h/2:.1f}" r="6" fill="#432838" opacity="0.8" />
+    </svg>
+    """
+    return svg
+
+def svg_tag(svg: str, width=288, height=30):
+    return f"<img src='data:image/svg+xml;utf8,{urllib.parse.quote(svg)}' width='{width}' height='{height}'/>"
+
+# All 101 marker positions, rendered and URL-encoded once per process.
+GRADIENT_TAGS = tuple(svg_tag(sma_gradient_svg(s)) for s in range(101))
+
+def gradient_tag(score) -> str:
+    """Precomputed <img> data-URI tag for sma_gradient_svg(score); None renders as 50."""
+    return GRADIENT_TAGS[50 if score is None else max(0, min(int(score), 100))]
+
+def overview_html(score, lines, connected: bool) -> str:
+    """Home 'Stress Overview' block: gradient bar plus today's calendar mini-overview."""
+    cal_html = "<div class='line'>No calendar connected</div>" if not connected else (
+        "<div class='line'>No events today</div>" if not lines else "".join([f"<div class='line'>{ln}</div>" for ln in lines])
+    )
+    return ("<div class='wrapper'><div class='block'><div class='badge'>Stress Overview</div>"
+            "<div class='stress-visual-wrap'><div class='stress-visual'>"
+            "<div class='viz-label'>Daily Stress Management Score (demo)</div>"
+            f"{gradient_tag(score)}</div></div>"
+            f"<div class='calmini'><div class='title'>schedule today</div>{cal_html}</div>"
+            "</div></div>")
@@ -0,0 +1,77 @@
+# Process-wide hourly forecast cache (Open-Meteo), refreshed in the background and
+# indexed by hour so every session's lookup is a dict hit instead of a download.
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from calmsync import metrics
+from calmsync.net import http_session
+
+EHV_LAT, EHV_LON = 51.4416, 5.4697
+FORECAST_URL = os.environ.get("CALMSYNC_WEATHER_URL", "https://api.open-meteo.com/v1/forecast")
+
+
+class WeatherCache:
+    def __init__(self, url=FORECAST_URL, lat=EHV_LAT, lon=EHV_LON, refresh_s=1800.0, retry_s=60.0, timeout=7):
+        self.url = url; self.lat = lat; self.lon = lon
+        self.refresh_s = refresh_s; self.retry_s = retry_s; self.timeout = timeout
+        self.hours = {}          # naive local hour -> (precip mm, wind m/s)
+        self.last = None         # forecast's final hour, used past the horizon
+        self.fetched_at = None
+        self._lock = threading.Lock(); self._stop = threading.Event(); self._thread = None
+
+    def refresh(self) -> bool:
+        """Download and re-index the forecast; keeps the previous one on failure."""
+        params = {"latitude": self.lat, "longitude": self.lon, "hourly": "precipitation,wind_speed_10m",
+                  "timezone": "Europe/Amsterdam"}
+        try:
+            with metrics.span("weather.fetch"):
+                r = http_session().get(self.url, params=params, timeout=self.timeout); r.raise_for_status()
+                metrics.incr("weather_bytes_downloaded", len(r.content))
+                h = r.json()["hourly"]
+                hours = {datetime.fromisoformat(t): (float(p), float(w))
+                         for t, p, w in zip(h["time"], h["precipitation"], h["wind_speed_10m"])}
+        except Exception:
+            metrics.incr("weather_fetch_errors")
+            return False
+        if not hours: return False
+        self.hours, self.last = hours, hours[max(hours)]
+        self.fetched_at = time.time()
+        return True
+
+    def start(self):
+        """Load once (single-flight) and keep refreshing on a daemon thread."""
+        with self._lock:
+            if self._thread is not None: return
+            self.refresh()
+            self._thread = threading.Thread(target=self._loop, name="weather-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.refresh_s if self.hours else self.retry_s):
+            self.refresh()
+
+    def at(self, when: datetime):
+        """{"precip", "wind"} for the hour containing `when` (local time), or None if never loaded."""
+        if self._thread is None: self.start()
+        hours = self.hours
+        if not hours: return None
+        metrics.incr("weather_cache_hits")
+        p, w = hours.get(when.replace(minute=0, second=0, microsecond=0, tzinfo=None), self.last)
+        return {"precip": p, "wind": w}
+
+    def hourly(self, start: datetime, n: int):
+        """[(precip, wind)] for `n` consecutive hours from the one containing aware `start`, or None."""
+        if self._thread is None: self.start()
+        hours = self.hours
+        if not hours: return None
+        h0 = start.replace(minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+        tz = start.tzinfo
+        return [hours.get((h0 + timedelta(hours=i)).astimezone(tz).replace(tzinfo=None), self.last) for i in range(n)]
+
+
+weather_cache = WeatherCache()
@@ -0,0 +1,230 @@
+"""Multi-session load test: many virtual users through initial → home → rec → accept → after.
+
+Every session is a Streamlit AppTest driving the real stressapp.py; each widget action
+is one timed rerun. Calendar and weather requests go to local stand-in servers started
+here (synthetic ICS feeds with ETag/304 support, an Open-Meteo-shaped forecast), so the
+run is offline and repeatable.
+
+AppTest swaps Streamlit's global Runtime on every run, so reruns inside one process are
+serialised. `--concurrency` sessions are therefore kept alive and interleaved step by
+step inside each process (sharing its feed/weather caches like one server process
+would), and `--processes` adds real parallelism on top.
+
+Prints one JSON summary: rerun latency p50/p95/p99 (overall and per step), reruns/s and
+sessions/s, per-session session_state bytes (own vs. shared with other sessions) and
+process RSS growth per live session.
+
+    python loadtest.py                                   # 40 sessions, 8 live at a time
+    python loadtest.py --sessions 200 --concurrency 25 --processes 4 --feeds 3 --events 5000
+    python loadtest.py --feed-latency-ms 150 --out loadtest.jsonl
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from zoneinfo import ZoneInfo
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stressapp.py")
+TZ = ZoneInfo("Europe/Amsterdam")
+FAVORITES = ["Walk outside", "Stretch", "Tea break"]
+STEPS = ("open", "favorites", "calendar_urls", "save_calendar", "next", "suggest", "accept", "duration",
+         "did_break", "next_day")
+
+
+# ── stand-in servers ─────────────────────────────────────────────────────────
+def forecast_body(days: int = 8) -> bytes:
+    day0 = datetime.now(TZ).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    hours = [day0 + timedelta(hours=h) for h in range(days * 24)]
+    return json.dumps({"hourly": {"time": [h.strftime("%Y-%m-%dT%H:%M") for h in hours],
+                                  "precipitation": [round((h.hour % 7) * 0.1, 1) for h in hours],
+                                  "wind_speed_10m": [3.0 + (h.hour % 5) for h in hours]}}).encode()
+
+def start_servers(feeds: int, events: int, latency_s: float = 0.0):
+    """Serve /feed<i>.ics and /v1/forecast on 127.0.0.1; returns (base_url, hit counter)."""
+    from bench import synthetic_ics
+    anchor = datetime.now(TZ).replace(minute=0, second=0, microsecond=0)
+    bodies = {f"/feed{i}.ics": synthetic_ics(events, seed=i, history_days=60, ahead_days=30, anchor=anchor).encode()
+              for i in range(feeds)}
+    bodies["/v1/forecast"] = forecast_body()
+    etags = {p: '"' + hashlib.sha1(b).hexdigest()[:16] + '"' for p, b in bodies.items()}
+    hits = {"200": 0, "304": 0, "404": 0}; lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if latency_s: time.sleep(latency_s)
+            path = self.path.split("?", 1)[0]; body = bodies.get(path)
+            if body is None: code, body = 404, b""
+            elif self.headers.get("If-None-Match") == etags[path]: code, body = 304, b""
+            else: code = 200
+            with lock: hits[str(code)] += 1
+            self.send_response(code)
+            if code != 404: self.send_header("ETag", etags[path])
+            self.send_header("Content-Type", "application/json" if path.endswith("forecast") else "text/calendar")
+            self.send_header("Content-Length", str(len(body))); self.end_headers()
+            if body: self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler); srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, name="loadtest-http", daemon=True).start()
+    return f"http://127.0.0.1:{srv.server_port}", hits
+
+
+# ── sessions ─────────────────────────────────────────────────────────────────
+def session_flow(at, urls: str):
+    """Yield (step, action) pairs walking one user through every page; each action is one rerun."""
+    def click(label):
+        return lambda: next(b for b in at.button if b.label == label).click().run()
+    yield "open", at.run
+    yield "favorites", lambda: at.multiselect[0].set_value(FAVORITES).run()
+    yield "calendar_urls", lambda: at.text_area(key="cal_url_input").set_value(urls).run()
+    yield "save_calendar", lambda: at.button(key="save_cal_btn").click().run()
+    yield "next", click("Next →")
+    yield "suggest", click("Suggest break")
+    yield "accept", click("Accept")
+    yield "duration", lambda: at.slider[0].set_value(30).run()
+    yield "did_break", click("I did this break")
+    yield "next_day", click("Next day ▶")
+
+def deep_size(obj, seen: set) -> int:
+    """Bytes reachable from `obj` not already in `seen` (which is updated)."""
+    import types
+    stack = [obj]; total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+            continue
+        seen.add(id(o)); total += sys.getsizeof(o, 0)
+        if isinstance(o, dict): stack.extend(o.keys()); stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)): stack.extend(o)
+        else:
+            d = getattr(o, "__dict__", None)
+            if d is not None: stack.append(d)
+            for slot in getattr(type(o), "__slots__", ()):
+                v = getattr(o, slot, None)
+                if v is not None: stack.append(v)
+    return total
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def run_worker(n_sessions: int, concurrency: int, urls: str, timeout: float):
+    """Drive `n_sessions` in waves of `concurrency` interleaved sessions; returns raw measurements."""
+    from streamlit.testing.v1 import AppTest
+    lat = []; errors = []; own = []; total = []; rss_per = []
+    t0 = time.perf_counter(); done = 0
+    while done < n_sessions:
+        wave = min(concurrency, n_sessions - done)
+        rss0 = rss_bytes()
+        apps = [AppTest.from_file(APP, default_timeout=timeout) for _ in range(wave)]
+        flows = [session_flow(at, urls) for at in apps]
+        live = list(range(wave))
+        while live:
+            for i in list(live):
+                step = next(flows[i], None)
+                if step is None: live.remove(i); continue
+                name, action = step
+                s = time.perf_counter()
+                try:
+                    action(); err = apps[i].exception
+                except Exception as ex:
+                    err = f"{type(ex).__name__}: {ex}"
+                lat.append((name, (time.perf_counter() - s) * 1000))
+                if err: errors.append(f"{name}: {str(err)[:200]}"); live.remove(i)
+        rss_per.append((rss_bytes() - rss0) / wave)
+        shared = set()
+        for at in apps:
+            state = at.session_state.to_dict()
+            total.append(deep_size(state, set()))
+            own.append(deep_size(state, shared))   # what this session adds on top of the ones before it
+        done += wave
+    return {"lat": lat, "errors": errors, "own": own, "total": total, "rss_per": rss_per,
+            "wall": time.perf_counter() - t0, "sessions": n_sessions}
+
+def _worker_entry(args):
+    return run_worker(*args)
+
+
+# ── report ───────────────────────────────────────────────────────────────────
+def pct(values, q):
+    if not values: return None
+    v = sorted(values); k = (len(v) - 1) * q / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return round(v[lo] + (v[hi] - v[lo]) * (k - lo), 2)
+
+def summarize(parts, wall, args, hits):
+    lat = [ms for p in parts for _, ms in p["lat"]]
+    by_step = {}
+    for p in parts:
+        for name, ms in p["lat"]: by_step.setdefault(name, []).append(ms)
+    own = [b for p in parts for b in p["own"]]; total = [b for p in parts for b in p["total"]]
+    rss = [b for p in parts for b in p["rss_per"]]
+    errors = [e for p in parts for e in p["errors"]]
+    return {
+        "sessions": args.sessions, "concurrency": args.concurrency, "processes": args.processes,
+        "feeds": args.feeds, "events_per_feed": args.events, "feed_latency_ms": args.feed_latency_ms,
+        "reruns": len(lat), "errors": len(errors), "error_samples": errors[:5], "wall_s": round(wall, 2),
+        "reruns_per_s": round(len(lat) / wall, 1), "sessions_per_s": round(args.sessions / wall, 2),
+        "latency_ms": {"p50": pct(lat, 50), "p95": pct(lat, 95), "p99": pct(lat, 99), "max": pct(lat, 100)},
+        "steps_ms": {s: {"p50": pct(by_step[s], 50), "p95": pct(by_step[s], 95), "p99": pct(by_step[s], 99)}
+                     for s in STEPS if s in by_step},
+        "session_state_kib": {"own_median": round(statistics.median(own) / 1024, 1) if own else None,
+                              "own_max": round(max(own) / 1024, 1) if own else None,
+                              "reachable_median": round(statistics.median(total) / 1024, 1) if total else None},
+        "rss_kib_per_live_session": round(statistics.median(rss) / 1024, 1) if rss else None,
+        "http": dict(hits),
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=40, help="virtual users in total")
+    ap.add_argument("--concurrency", type=int, default=8, help="sessions alive and interleaved per process")
+    ap.add_argument("--processes", type=int, default=1)
+    ap.add_argument("--feeds", type=int, default=2, help="calendar URLs per user")
+    ap.add_argument("--events", type=int, default=2000, help="events per synthetic feed")
+    ap.add_argument("--feed-latency-ms", type=float, default=0.0, help="added server latency per request")
+    ap.add_argument("--timeout", type=float, default=60.0, help="AppTest timeout per rerun (s)")
+    ap.add_argument("--out", help="append the JSON summary to this file as well as stdout")
+    args = ap.parse_args(argv)
+
+    base, hits = start_servers(args.feeds, args.events, args.feed_latency_ms / 1000)
+    tmp = tempfile.mkdtemp(prefix="calmsync-load-")
+    os.environ["CALMSYNC_WEATHER_URL"] = f"{base}/v1/forecast"   # read by calmsync on import
+    os.environ["CALMSYNC_DB"] = os.path.join(tmp, "load.db")
+    urls = "\n".join(f"{base}/feed{i}.ics" for i in range(args.feeds))
+
+    shares = [args.sessions // args.processes + (i < args.sessions % args.processes) for i in range(args.processes)]
+    jobs = [(n, args.concurrency, urls, args.timeout) for n in shares if n]
+    t0 = time.perf_counter()
+    if len(jobs) == 1:
+        parts = [run_worker(*jobs[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(len(jobs)) as pool:
+            parts = pool.map(_worker_entry, jobs)
+    rec = summarize(parts, time.perf_counter() - t0, args, hits)
+    rec["ts"] = datetime.now(TZ).isoformat(timespec="seconds")
+    line = json.dumps(rec)
+    print(line, flush=True)
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f: f.write(line + "\n")
+    return 1 if rec["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())